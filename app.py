@@ -9,6 +9,7 @@ import extra_streamlit_components as stx
 from modules import login, martyr_board, scheduler, settings, pricing, legal, vote, guide, cookie_consent, onboarding, team
 import datetime as dt
 import cron_worker
+import webhook_utils
 
 @st.cache_resource
 def _get_logo_b64():
@@ -29,10 +30,13 @@ def start_background_worker():
             try:
                 cron_worker.refresh_all_tokens()
                 cron_worker.close_expired_polls()
+                cron_worker.renew_calendar_channels()
             except Exception:
                 pass
             time.sleep(3600)
     threading.Thread(target=cron_loop, daemon=True).start()
+    if webhook_utils.push_enabled():
+        webhook_utils.start_webhook_server()
     return True
 
 start_background_worker()
@@ -1,98 +1,603 @@
 import asyncio
 import aiohttp
 import datetime as dt
+import functools
+import os
+import threading
+import uuid
 from db import supabase
+from nync_core.busy_intervals import BusyIntervals, to_minutes
+from http_utils import JsonArrayStream, iter_json_array, provider_request, tenant_of
 import streamlit as st
 
-async def fetch_outlook_events_async(session, user_id, start_dt, end_dt):
-    try:
-        response = supabase.table("calendar_connections").select("access_token").eq("user_id", user_id).eq("provider", "outlook").maybe_single().execute()
-        if not response or not response.data: return user_id, {}
-        token = response.data.get('access_token')
+# Overridable so the fetchers can run against a local mock server
+GOOGLE_API = os.environ.get("NYNC_GOOGLE_API", "https://www.googleapis.com/calendar/v3")
+GRAPH_API = os.environ.get("NYNC_GRAPH_API", "https://graph.microsoft.com/v1.0")
+# "freebusy" pulls busy intervals only (events show as "Busy"); "events" lists full events with titles
+GOOGLE_SYNC_MODE = os.environ.get("NYNC_GOOGLE_SYNC", "events")
+# "batch" groups calendarView calls into Graph $batch requests; "schedule" uses getSchedule; "events" is one call per user
+OUTLOOK_SYNC_MODE = os.environ.get("NYNC_OUTLOOK_SYNC", "events")
+# Per-user fetches keep a Google syncToken / Graph deltaLink in calendar_sync_state and only pull changes
+INCREMENTAL_SYNC = os.environ.get("NYNC_INCREMENTAL_SYNC", "1") != "0"
+# Full syncs open a window of at least this many days so shorter views reuse the same cursor
+SYNC_MIN_DAYS = 30
+FREEBUSY_MAX_CALENDARS = 50
+GRAPH_BATCH_MAX = 20
+GRAPH_UTC = {"Prefer": "outlook.timezone=\"UTC\""}
+# "stream" asks for only the event fields the busy model reads, in large pages, and parses each
+# page as it arrives so memory per member stays flat; "full" fetches whole resources and bodies
+EVENT_FETCH_MODE = os.environ.get("NYNC_EVENT_FETCH", "stream")
+GOOGLE_EVENT_FIELDS = "nextPageToken,nextSyncToken,items(id,status,summary,start/dateTime,end/dateTime)"
+GOOGLE_PAGE_SIZE = 2500
+GRAPH_PAGE_SIZE = 500
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+# One event loop thread per process owns every provider connection, so warm syncs reuse
+# pooled keep-alive sockets and cached DNS instead of new TCP/TLS handshakes
+_loop = None
+_loop_lock = threading.Lock()
+_session = None
+_session_loop = None
+
+def provider_loop():
+    """The process-wide provider I/O loop, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True, name="nync-provider-io").start()
+            _loop = loop
+    return _loop
+
+def run_on_provider_loop(coro, timeout=None):
+    """Submits a coroutine to the provider loop from any thread and waits for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, provider_loop()).result(timeout)
+
+async def get_session():
+    """
+    Pooled session shared by every fetch on the provider loop. A caller on some other loop
+    (a script using asyncio.run) gets its own session, since sessions are bound to their loop.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, ttl_dns_cache=300, keepalive_timeout=60)
+        _session, _session_loop = aiohttp.ClientSession(connector=connector), loop
+    return _session
+
+# --- TOKEN REFRESH ---
+
+# Keyed by (user_id, provider): the refresh in flight, and the last (stale, new) token pair
+_refreshing = {}
+_refreshed = {}
+
+def _token_request(provider, refresh_token):
+    """Token endpoint and refresh_token grant form, as in calendar_utils.refresh_*_token."""
+    if provider == 'google':
+        return GOOGLE_TOKEN_URL, {
+            "client_id": st.secrets["google"]["client_id"],
+            "client_secret": st.secrets["google"]["client_secret"],
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token",
+        }
+    return f"{st.secrets['microsoft']['authority']}/oauth2/v2.0/token", {
+        "client_id": st.secrets["microsoft"]["client_id"],
+        "client_secret": st.secrets["microsoft"]["client_secret"],
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token",
+        "scope": "Calendars.ReadWrite offline_access User.Read",
+    }
+
+async def _refresh(session, user_id, provider):
+    query = supabase.table("calendar_connections").select("refresh_token").eq("user_id", user_id).eq("provider", provider).maybe_single()
+    record = await asyncio.to_thread(query.execute)
+    refresh_token = record.data.get("refresh_token") if record and record.data else None
+    if not refresh_token: return None
+
+    url, payload = _token_request(provider, refresh_token)
+    async with provider_request(session, 'POST', url, provider, data=payload) as r:
+        new_tokens = await r.json(content_type=None)
+    if "access_token" not in new_tokens: return None
+
+    exp_secs = new_tokens.get("expires_in", 3599 if provider == 'google' else 3600)
+    update = {
+        "access_token": new_tokens["access_token"],
+        "expires_in": exp_secs,
+        "expires_at": (dt.datetime.utcnow() + dt.timedelta(seconds=exp_secs)).isoformat(),
+    }
+    # Microsoft rotates refresh tokens; Google keeps the original
+    if new_tokens.get("refresh_token"):
+        update["refresh_token"] = new_tokens["refresh_token"]
+    query = supabase.table("calendar_connections").update(update).eq("user_id", user_id).eq("provider", provider)
+    await asyncio.to_thread(query.execute)
+    return new_tokens["access_token"]
+
+async def refresh_access_token(session, user_id, provider, stale_token=None):
+    """
+    New access token for a connection whose `stale_token` was rejected, or None. Every request
+    that hits the 401 at once awaits the same refresh, and one arriving later with the same
+    stale token gets the stored result, so a connection is refreshed once per expiry. Without
+    a stale token (proactive refresh from the cron worker) it always refreshes.
+    """
+    key = (str(user_id), provider)
+    last = _refreshed.get(key)
+    if stale_token and last and last[0] == stale_token:
+        return last[1]
+
+    task = _refreshing.get(key)
+    if task is None:
+        async def run():
+            try:
+                token = await _refresh(session, user_id, provider)
+            except Exception as e:
+                print(f"[nync] Could not refresh {provider} token for user {user_id}: {e}")
+                token = None
+            if token and stale_token:
+                _refreshed[key] = (stale_token, token)
+            return token
+        task = _refreshing[key] = asyncio.ensure_future(run())
+        task.add_done_callback(lambda _: _refreshing.pop(key, None))
+    # Shielded so one caller being cancelled doesn't cancel the refresh the others wait on
+    return await asyncio.shield(task)
+
+def _refresher(session, user_id, provider):
+    return functools.partial(refresh_access_token, session, user_id, provider)
+
+def _add_graph_event(blocked, e):
+    # Events carry showAs, getSchedule items carry status
+    if e.get('showAs', e.get('status')) == 'free': return
+    start = dt.datetime.fromisoformat(e['start']['dateTime'].replace('Z', '+00:00'))
+    end = dt.datetime.fromisoformat(e['end']['dateTime'].replace('Z', '+00:00'))
+    blocked.add(start, end, e.get('subject') or 'Busy')
+
+def _add_graph_events(blocked, events):
+    for e in events:
+        _add_graph_event(blocked, e)
+    return blocked
+
+def _streaming():
+    return EVENT_FETCH_MODE == 'stream'
 
-        headers = {"Authorization": f"Bearer {token}", "Prefer": "outlook.timezone=\"UTC\""}
+def _google_list_params(params):
+    if not _streaming(): return params
+    return {**params, "fields": GOOGLE_EVENT_FIELDS, "maxResults": str(GOOGLE_PAGE_SIZE)}
+
+def _graph_page_headers(headers):
+    # calendarView/delta takes no $top; page size is asked for with a Prefer header instead
+    if not _streaming(): return headers
+    return {**headers, "Prefer": f"{headers['Prefer']}, odata.maxpagesize={GRAPH_PAGE_SIZE}"}
+
+async def _graph_pages(session, data, headers, tenant=None, refresh=None):
+    """
+    Every item from a Graph response, following @odata.nextLink until the last page. A failed
+    page raises rather than passing off the pages so far as the whole calendar.
+    """
+    items = list(data.get('value', []))
+    while data.get('@odata.nextLink'):
+        async with provider_request(session, 'GET', data['@odata.nextLink'], 'outlook', tenant, refresh=refresh, headers=headers) as r:
+            if r.status != 200:
+                raise aiohttp.ClientResponseError(r.request_info, r.history, status=r.status, message="Graph page failed")
+            data = await r.json()
+        items += data.get('value', [])
+    return items
+
+async def fetch_outlook_events_async(session, user_id, token, start_dt, end_dt, tenant=None):
+    """(user_id, busy), with busy None when the calendar could not be read."""
+    if not token: return user_id, BusyIntervals()
+    try:
+        headers = {"Authorization": f"Bearer {token}", **GRAPH_UTC}
         start_str = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
         end_str = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        endpoint = f"https://graph.microsoft.com/v1.0/me/calendarview?startDateTime={start_str}&endDateTime={end_str}&$select=subject,start,end,showAs"
+        url = f"{GRAPH_API}/me/calendarview?startDateTime={start_str}&endDateTime={end_str}&$select=subject,start,end,showAs"
+        if _streaming():
+            url += f"&$top={GRAPH_PAGE_SIZE}"
 
-        async with session.get(endpoint, headers=headers, timeout=5) as r:
-            if r.status != 200: return user_id, {}
-            data = await r.json()
+        refresh = _refresher(session, user_id, 'outlook')
+        blocked = BusyIntervals()
+        while url:
+            async with provider_request(session, 'GET', url, 'outlook', tenant, refresh=refresh, headers=headers) as r:
+                if r.status != 200: return user_id, None
+                parser = JsonArrayStream('value')
+                async for e in iter_json_array(r, parser, _streaming()):
+                    _add_graph_event(blocked, e)
+            url = parser.meta.get('@odata.nextLink')
+        return user_id, blocked
+    except:
+        return user_id, None
+
+async def fetch_google_events_async(session, user_id, token, start_dt, end_dt, tenant=None):
+    """(user_id, busy), with busy None when the calendar could not be read."""
+    if not token: return user_id, BusyIntervals()
+    try:
+        params = _google_list_params({"timeMin": start_dt.isoformat() + "Z", "timeMax": end_dt.isoformat() + "Z", "singleEvents": "true"})
+        headers = {"Authorization": f"Bearer {token}"}
+        refresh = _refresher(session, user_id, 'google')
 
-            blocked = {}
-            for e in data.get('value', []):
-                title = e.get('subject', 'Busy')
-                start = dt.datetime.fromisoformat(e['start']['dateTime'].replace('Z', '+00:00'))
-                end = dt.datetime.fromisoformat(e['end']['dateTime'].replace('Z', '+00:00'))
-                start_naive = start.astimezone(dt.timezone.utc).replace(tzinfo=None)
-                end_naive = end.astimezone(dt.timezone.utc).replace(tzinfo=None)
-                curr = start_naive
-                while curr < end_naive:
-                    blocked[curr.replace(minute=0, second=0, microsecond=0).isoformat()] = title
-                    curr += dt.timedelta(hours=1)
-
-            return user_id, blocked
+        blocked, page_token = BusyIntervals(), None
+        while True:
+            page = {**params, "pageToken": page_token} if page_token else params
+            async with provider_request(session, 'GET', f"{GOOGLE_API}/calendars/primary/events", 'google', tenant,
+                                        refresh=refresh, params=page, headers=headers) as r:
+                if r.status != 200: return user_id, None
+                parser = JsonArrayStream('items')
+                async for i in iter_json_array(r, parser, _streaming()):
+                    if 'dateTime' not in i.get('start', {}): continue
+                    blocked.add(i['start']['dateTime'], i['end']['dateTime'], i.get('summary', 'Busy'))
+            page_token = parser.meta.get('nextPageToken')
+            if not page_token:
+                return user_id, blocked
     except:
-        return user_id, {}
+        return user_id, None
+
+def _sync_window(state, start_dt, end_dt):
+    """Stored (events, cursor, window) when the state's window covers the request, else a fresh full-sync window."""
+    if state and state.get('cursor') and to_minutes(state['window_start']) <= to_minutes(start_dt) \
+            and to_minutes(end_dt) <= to_minutes(state['window_end']):
+        window = (state['window_start'], state['window_end'])
+        return dict(state.get('events') or {}), state['cursor'], window
+    window_end = max(end_dt, start_dt + dt.timedelta(days=SYNC_MIN_DAYS))
+    return {}, None, (start_dt.isoformat(), window_end.isoformat())
+
+def _sync_result(user_id, provider, events, cursor, window):
+    # Incremental syncs report changes anywhere on the calendar; keep only what overlaps the window
+    lo, hi = to_minutes(window[0]), to_minutes(window[1])
+    events = {eid: e for eid, e in events.items() if e[1] > lo and e[0] < hi}
+    state = {
+        "user_id": user_id, "provider": provider, "cursor": cursor, "events": events,
+        "window_start": window[0], "window_end": window[1], "updated_at": dt.datetime.utcnow().isoformat(),
+    }
+    return user_id, BusyIntervals(events.values()), state
 
-async def fetch_google_events_async(session, user_id, start_dt, end_dt):
+def _sync_failed(user_id, events, cursor):
+    # With a stored cursor keep serving the cached events and retry it next sync; a failed
+    # first sync knows nothing, so the member is reported as unreadable
+    return user_id, BusyIntervals(events.values()) if cursor else None, None
+
+async def sync_google_events_async(session, user_id, token, start_dt, end_dt, state=None, tenant=None):
+    """
+    (user_id, busy, new_state) for a Google member. With a stored syncToken covering the window
+    only changed events are fetched; a 410 from Google means the token expired and triggers a full sync.
+    """
+    if not token: return user_id, BusyIntervals(), None
+    events, cursor, window = _sync_window(state, start_dt, end_dt)
+    headers = {"Authorization": f"Bearer {token}"}
+    refresh = _refresher(session, user_id, 'google')
+    if cursor:
+        params = _google_list_params({"syncToken": cursor, "singleEvents": "true"})
+    else:
+        params = _google_list_params({"timeMin": window[0] + "Z", "timeMax": window[1] + "Z", "singleEvents": "true"})
     try:
-        response = supabase.table("calendar_connections").select("access_token").eq("user_id", user_id).eq("provider", "google").maybe_single().execute()
-        if not response or not response.data: return user_id, {}
-        token = response.data.get('access_token')
+        page_token = None
+        while True:
+            page = {**params, "pageToken": page_token} if page_token else params
+            async with provider_request(session, 'GET', f"{GOOGLE_API}/calendars/primary/events", 'google', tenant,
+                                        refresh=refresh, params=page, headers=headers) as r:
+                if r.status == 410 and cursor:
+                    return await sync_google_events_async(session, user_id, token, start_dt, end_dt, tenant=tenant)
+                if r.status != 200: return _sync_failed(user_id, events, cursor)
+                parser = JsonArrayStream('items')
+                async for i in iter_json_array(r, parser, _streaming()):
+                    if i.get('status') == 'cancelled' or 'dateTime' not in i.get('start', {}):
+                        events.pop(i['id'], None)
+                        continue
+                    events[i['id']] = [to_minutes(i['start']['dateTime']), to_minutes(i['end']['dateTime']), i.get('summary', 'Busy')]
 
-        start_str = start_dt.isoformat() + "Z"
-        end_str = end_dt.isoformat() + "Z"
-        url = f"https://www.googleapis.com/calendar/v3/calendars/primary/events?timeMin={start_str}&timeMax={end_str}&singleEvents=true"
-        headers = {"Authorization": f"Bearer {token}"}
+            page_token = parser.meta.get('nextPageToken')
+            if not page_token:
+                return _sync_result(user_id, 'google', events, parser.meta.get('nextSyncToken'), window)
+    except:
+        return _sync_failed(user_id, events, cursor)
 
-        async with session.get(url, headers=headers, timeout=5) as r:
-            if r.status != 200: return user_id, {}
-            data = await r.json()
+async def sync_outlook_events_async(session, user_id, token, start_dt, end_dt, state=None, tenant=None):
+    """
+    (user_id, busy, new_state) for an Outlook member via calendarView/delta. A stored deltaLink
+    returns only changed and removed events; if Graph rejects it the window is synced from scratch.
+    """
+    if not token: return user_id, BusyIntervals(), None
+    events, cursor, window = _sync_window(state, start_dt, end_dt)
+    headers = _graph_page_headers({"Authorization": f"Bearer {token}", **GRAPH_UTC})
+    refresh = _refresher(session, user_id, 'outlook')
+    url = cursor or f"{GRAPH_API}/me/calendarView/delta?startDateTime={window[0]}Z&endDateTime={window[1]}Z"
+    try:
+        while True:
+            async with provider_request(session, 'GET', url, 'outlook', tenant, refresh=refresh, headers=headers) as r:
+                if r.status in (400, 404, 410) and cursor:
+                    return await sync_outlook_events_async(session, user_id, token, start_dt, end_dt, tenant=tenant)
+                if r.status != 200: return _sync_failed(user_id, events, cursor)
+                parser = JsonArrayStream('value')
+                async for e in iter_json_array(r, parser, _streaming()):
+                    if '@removed' in e or 'start' not in e or e.get('showAs') == 'free':
+                        events.pop(e['id'], None)
+                        continue
+                    events[e['id']] = [to_minutes(e['start']['dateTime']), to_minutes(e['end']['dateTime']), e.get('subject') or 'Busy']
+
+            url = parser.meta.get('@odata.nextLink')
+            if not url:
+                return _sync_result(user_id, 'outlook', events, parser.meta.get('@odata.deltaLink'), window)
+    except:
+        return _sync_failed(user_id, events, cursor)
+
+def _load_sync_states(user_ids):
+    try:
+        res = supabase.table('calendar_sync_state').select('*').in_('user_id', user_ids).execute()
+        return {(row['user_id'], row['provider']): row for row in (res.data or [])}
+    except Exception as e:
+        print(f"[nync] Could not load calendar sync state: {e}")
+        return {}
+
+def _state_changed(state, prev):
+    return not prev or state['cursor'] != prev.get('cursor') or state['events'] != (prev.get('events') or {})
+
+def _save_sync_states(states):
+    try:
+        supabase.table('calendar_sync_state').upsert(states, on_conflict='user_id,provider').execute()
+    except Exception as e:
+        print(f"[nync] Could not save calendar sync state: {e}")
+
+async def _fetch_chunked(session, members, size, fetch_chunk, fetch_one, start_dt, end_dt):
+    """
+    Runs fetch_chunk over (user_id, token, email) members in groups of `size`, each group asked
+    with its first member's token. Members without a token or email go straight to fetch_one.
+    """
+    bulk = [m for m in members if m[1] and m[2]]
+    chunks = [bulk[i:i + size] for i in range(0, len(bulk), size)]
+    batched, singles = await asyncio.gather(
+        asyncio.gather(*[fetch_chunk(session, c, start_dt, end_dt) for c in chunks]),
+        asyncio.gather(*[fetch_one(session, uid, token, start_dt, end_dt, tenant_of(email))
+                         for uid, token, email in members if not (token and email)]),
+    )
+    return [r for rs in batched for r in rs] + list(singles)
+
+async def _query_freebusy(session, user_id, token, calendar_ids, start_dt, end_dt):
+    body = {
+        "timeMin": start_dt.isoformat() + "Z",
+        "timeMax": end_dt.isoformat() + "Z",
+        "items": [{"id": c} for c in calendar_ids],
+    }
+    try:
+        async with provider_request(session, 'POST', f"{GOOGLE_API}/freeBusy", 'google', tenant_of(calendar_ids[0]),
+                                    refresh=_refresher(session, user_id, 'google'),
+                                    json=body, headers={"Authorization": f"Bearer {token}"}) as r:
+            if r.status != 200: return {}
+            return (await r.json()).get('calendars', {})
+    except:
+        return {}
+
+async def _fetch_freebusy_chunk(session, chunk, start_dt, end_dt):
+    # Calendars the shared token can't read come back with errors and are listed per user instead
+    calendars = await _query_freebusy(session, chunk[0][0], chunk[0][1], [email for _, _, email in chunk], start_dt, end_dt)
+    results, fallback = [], []
+    for uid, token, email in chunk:
+        cal = calendars.get(email)
+        if cal is None or cal.get('errors'):
+            fallback.append(fetch_google_events_async(session, uid, token, start_dt, end_dt, tenant_of(email)))
+            continue
+        blocked = BusyIntervals()
+        for b in cal.get('busy', []):
+            blocked.add(b['start'], b['end'])
+        results.append((uid, blocked))
+    return results + list(await asyncio.gather(*fallback))
+
+async def fetch_google_freebusy_async(session, members, start_dt, end_dt):
+    """Busy intervals for (user_id, token, email) members via Google FreeBusy, 50 calendars per request."""
+    return await _fetch_chunked(session, members, FREEBUSY_MAX_CALENDARS, _fetch_freebusy_chunk,
+                                fetch_google_events_async, start_dt, end_dt)
+
+async def _fetch_graph_batch_chunk(session, chunk, start_dt, end_dt):
+    headers = {"Authorization": f"Bearer {chunk[0][1]}", **GRAPH_UTC}
+    refresh = _refresher(session, chunk[0][0], 'outlook')
+    start_str = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    end_str = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    top = f"&$top={GRAPH_PAGE_SIZE}" if _streaming() else ""
+    body = {"requests": [
+        {"id": str(i), "method": "GET", "headers": GRAPH_UTC,
+         "url": f"/users/{email}/calendarView?startDateTime={start_str}&endDateTime={end_str}&$select=subject,start,end,showAs{top}"}
+        for i, (_, _, email) in enumerate(chunk)
+    ]}
+    responses = {}
+    try:
+        async with provider_request(session, 'POST', f"{GRAPH_API}/$batch", 'outlook', tenant_of(chunk[0][2]),
+                                    refresh=refresh, json=body, headers=headers) as r:
+            if r.status == 200:
+                responses = {resp.get('id'): resp for resp in (await r.json()).get('responses', [])}
+    except:
+        pass
+
+    results, fallback = [], []
+    for i, (uid, token, email) in enumerate(chunk):
+        resp = responses.get(str(i))
+        if not resp or resp.get('status') != 200:
+            fallback.append(fetch_outlook_events_async(session, uid, token, start_dt, end_dt, tenant_of(email)))
+            continue
+        try:
+            events = await _graph_pages(session, resp.get('body') or {}, headers, tenant_of(email), refresh)
+            results.append((uid, _add_graph_events(BusyIntervals(), events)))
+        except:
+            fallback.append(fetch_outlook_events_async(session, uid, token, start_dt, end_dt, tenant_of(email)))
+    return results + list(await asyncio.gather(*fallback))
 
-            blocked = {}
-            for i in data.get('items', []):
-                if 'dateTime' not in i.get('start', {}): continue
-                title = i.get('summary', 'Busy')
-                start = dt.datetime.fromisoformat(i['start']['dateTime'])
-                end = dt.datetime.fromisoformat(i['end']['dateTime'])
-                start_naive = start.astimezone(dt.timezone.utc).replace(tzinfo=None) if start.tzinfo else start
-                end_naive = end.astimezone(dt.timezone.utc).replace(tzinfo=None) if end.tzinfo else end
-                curr = start_naive
-                while curr < end_naive:
-                    blocked[curr.replace(minute=0, second=0, microsecond=0).isoformat()] = title
-                    curr += dt.timedelta(hours=1)
-
-            return user_id, blocked
+async def _fetch_graph_schedule_chunk(session, chunk, start_dt, end_dt):
+    headers = {"Authorization": f"Bearer {chunk[0][1]}", **GRAPH_UTC}
+    refresh = _refresher(session, chunk[0][0], 'outlook')
+    body = {
+        "schedules": [email for _, _, email in chunk],
+        "startTime": {"dateTime": start_dt.isoformat(), "timeZone": "UTC"},
+        "endTime": {"dateTime": end_dt.isoformat(), "timeZone": "UTC"},
+        "availabilityViewInterval": 30,
+    }
+    schedules = {}
+    try:
+        async with provider_request(session, 'POST', f"{GRAPH_API}/me/calendar/getSchedule", 'outlook', tenant_of(chunk[0][2]),
+                                    refresh=refresh, json=body, headers=headers) as r:
+            if r.status == 200:
+                data = await r.json()
+                schedules = {s.get('scheduleId', '').lower(): s for s in await _graph_pages(session, data, headers, tenant_of(chunk[0][2]), refresh)}
     except:
-        return user_id, {}
+        pass
+
+    results, fallback = [], []
+    for uid, token, email in chunk:
+        schedule = schedules.get(email.lower())
+        if not schedule or schedule.get('error'):
+            fallback.append(fetch_outlook_events_async(session, uid, token, start_dt, end_dt, tenant_of(email)))
+            continue
+        results.append((uid, _add_graph_events(BusyIntervals(), schedule.get('scheduleItems', []))))
+    return results + list(await asyncio.gather(*fallback))
+
+async def fetch_outlook_bulk_async(session, members, start_dt, end_dt, mode="batch"):
+    """
+    Busy intervals for (user_id, token, email) Outlook members in groups of 20: Graph $batch
+    over calendarView, or getSchedule for availability only. Members the shared token can't
+    read fall back to their own calendarView.
+    """
+    fetch_chunk = _fetch_graph_schedule_chunk if mode == 'schedule' else _fetch_graph_batch_chunk
+    return await _fetch_chunked(session, members, GRAPH_BATCH_MAX, fetch_chunk,
+                                fetch_outlook_events_async, start_dt, end_dt)
 
 async def gather_all_conflicts(roster, start_date, days):
+    """
+    {user_id: BusyIntervals} for the roster's connected calendars. Members without a calendar
+    map to an empty BusyIntervals; members whose calendar could not be read are left out, so
+    callers can tell them apart from a free calendar and try again later.
+    """
     start_dt = dt.datetime.combine(start_date, dt.time.min)
     end_dt = start_dt + dt.timedelta(days=days)
 
     user_ids = [m.get('user_id') for m in roster if m.get('user_id')]
     if not user_ids: return {}
 
-    res = supabase.table('calendar_connections').select('user_id, provider').in_('user_id', user_ids).execute()
+    # Tokens come back with the connections so no fetch has to block on the DB. DB calls run
+    # in a worker thread so they never stall other syncs sharing the provider loop.
+    query = supabase.table('calendar_connections').select('user_id, provider, access_token').in_('user_id', user_ids)
+    res = await asyncio.to_thread(query.execute)
     connections = res.data if res.data else []
 
-    tasks = []
-    async with aiohttp.ClientSession() as session:
-        for conn in connections:
-            uid = conn['user_id']
-            provider = conn['provider']
-            if provider == 'outlook':
-                tasks.append(fetch_outlook_events_async(session, uid, start_dt, end_dt))
-            elif provider == 'google':
-                tasks.append(fetch_google_events_async(session, uid, start_dt, end_dt))
-        results = await asyncio.gather(*tasks)
-
-    conflicts_dict = {}
-    for uid, blocks in results:
-        if str(uid) not in conflicts_dict:
-            conflicts_dict[str(uid)] = blocks
+    emails = {m.get('user_id'): m.get('email') for m in roster if m.get('user_id')}
+    states = await asyncio.to_thread(_load_sync_states, user_ids) if INCREMENTAL_SYNC else {}
+    tasks, sync_tasks, google_members, outlook_members = [], [], [], []
+    session = await get_session()
+    for conn in connections:
+        uid = conn['user_id']
+        provider, token = conn['provider'], conn.get('access_token')
+        tenant = tenant_of(emails.get(uid))
+        if provider == 'outlook' and OUTLOOK_SYNC_MODE in ('batch', 'schedule'):
+            outlook_members.append((uid, token, emails.get(uid)))
+        elif provider == 'outlook' and INCREMENTAL_SYNC:
+            sync_tasks.append(sync_outlook_events_async(session, uid, token, start_dt, end_dt, states.get((uid, provider)), tenant))
+        elif provider == 'outlook':
+            tasks.append(fetch_outlook_events_async(session, uid, token, start_dt, end_dt, tenant))
+        elif provider == 'google' and GOOGLE_SYNC_MODE == 'freebusy':
+            google_members.append((uid, token, emails.get(uid)))
+        elif provider == 'google' and INCREMENTAL_SYNC:
+            sync_tasks.append(sync_google_events_async(session, uid, token, start_dt, end_dt, states.get((uid, provider)), tenant))
+        elif provider == 'google':
+            tasks.append(fetch_google_events_async(session, uid, token, start_dt, end_dt, tenant))
+    per_user, synced, google, outlook = await asyncio.gather(
+        asyncio.gather(*tasks),
+        asyncio.gather(*sync_tasks),
+        fetch_google_freebusy_async(session, google_members, start_dt, end_dt),
+        fetch_outlook_bulk_async(session, outlook_members, start_dt, end_dt, OUTLOOK_SYNC_MODE),
+    )
+    results = list(per_user) + [(uid, busy) for uid, busy, _ in synced] + google + outlook
+
+    new_states = [state for _, _, state in synced
+                  if state and _state_changed(state, states.get((state['user_id'], state['provider'])))]
+    if new_states:
+        await asyncio.to_thread(_save_sync_states, new_states)
+
+    connected = {str(conn['user_id']) for conn in connections}
+    conflicts = {str(uid): BusyIntervals() for uid in user_ids if str(uid) not in connected}
+    failed = {str(uid) for uid, busy in results if busy is None}
+    for uid, busy in results:
+        uid = str(uid)
+        if uid in failed: continue
+        if uid not in conflicts:
+            conflicts[uid] = busy
         else:
-            conflicts_dict[str(uid)].update(blocks)
+            conflicts[uid].update(busy)
+
+    if failed:
+        print(f"[nync] Could not read {len(failed)} calendar(s); left out of this sync")
+    return conflicts
+
+
+# --- SINGLE-MEMBER FETCH & BOOKING (wrapped synchronously by calendar_utils) ---
+
+def _connection_token(user_id, provider):
+    res = supabase.table("calendar_connections").select("access_token").eq("user_id", user_id).eq("provider", provider).maybe_single().execute()
+    return res.data.get("access_token") if res and res.data else None
+
+async def fetch_member_busy(user_id, provider, start_dt, end_dt):
+    """One member's BusyIntervals; empty without a connection, None when the calendar could not be read."""
+    token = await asyncio.to_thread(_connection_token, user_id, provider)
+    fetch = fetch_google_events_async if provider == 'google' else fetch_outlook_events_async
+    return (await fetch(await get_session(), user_id, token, start_dt, end_dt))[1]
+
+async def refresh_connection(user_id, provider):
+    """Refreshes a connection's access token ahead of expiry; returns it, or None."""
+    return await refresh_access_token(await get_session(), user_id, provider)
+
+def _error_message(data, default):
+    error = data.get('error') if isinstance(data, dict) else None
+    return error.get('message', default) if isinstance(error, dict) else default
+
+async def _json_request(session, method, url, user_id, provider, headers, **kwargs):
+    async with provider_request(session, method, url, provider, refresh=_refresher(session, user_id, provider),
+                                headers=headers, **kwargs) as r:
+        return r.status, await r.json(content_type=None) or {}
+
+async def book_google_meeting_async(user_id, subject, start_dt_utc, duration_minutes, emails):
+    """
+    (booked, meet_link, status, error_message) for a Meet-enabled event on the organiser's
+    primary calendar; status is None without a Google connection. The event id is chosen
+    here, so a retried insert that already landed comes back 409 instead of double-booking.
+    """
+    token = await asyncio.to_thread(_connection_token, user_id, 'google')
+    if not token: return False, None, None, None
+    session, headers = await get_session(), {"Authorization": f"Bearer {token}"}
+    event_id = uuid.uuid4().hex
+    end_dt_utc = start_dt_utc + dt.timedelta(minutes=duration_minutes)
+    payload = {
+        "id": event_id,
+        "summary": subject,
+        "start": {"dateTime": start_dt_utc.strftime("%Y-%m-%dT%H:%M:%S") + "Z"},
+        "end": {"dateTime": end_dt_utc.strftime("%Y-%m-%dT%H:%M:%S") + "Z"},
+        "attendees": [{"email": e} for e in emails],
+        "conferenceData": {
+            "createRequest": {
+                "requestId": f"nync_{user_id}_{int(dt.datetime.now().timestamp())}",
+                "conferenceSolutionKey": {"type": "hangoutsMeet"}
+            }
+        }
+    }
+    url = f"{GOOGLE_API}/calendars/primary/events"
+    status, data = await _json_request(session, 'POST', url, user_id, 'google', headers, json=payload,
+                                       params={"sendUpdates": "all", "conferenceDataVersion": "1"})
+    if status == 409:
+        status, data = await _json_request(session, 'GET', f"{url}/{event_id}", user_id, 'google', headers)
+    if status in (200, 201):
+        return True, data.get("hangoutLink"), status, None
+    return False, None, status, _error_message(data, 'Unknown API Error')
 
-    return conflicts_dict
+async def book_outlook_meeting_async(user_id, subject, start_dt_utc, duration_minutes, emails):
+    """
+    (booked, join_url, status, error_message) for a Teams meeting on the organiser's Outlook
+    calendar; status is None without an Outlook connection. transactionId lets Graph drop a
+    retried create that already went through.
+    """
+    token = await asyncio.to_thread(_connection_token, user_id, 'outlook')
+    if not token: return False, None, None, None
+    session, headers = await get_session(), {"Authorization": f"Bearer {token}"}
+    end_dt_utc = start_dt_utc + dt.timedelta(minutes=duration_minutes)
+    payload = {
+        "subject": subject,
+        "start": {"dateTime": start_dt_utc.strftime("%Y-%m-%dT%H:%M:%S"), "timeZone": "UTC"},
+        "end": {"dateTime": end_dt_utc.strftime("%Y-%m-%dT%H:%M:%S"), "timeZone": "UTC"},
+        "attendees": [{"emailAddress": {"address": e}, "type": "required"} for e in emails],
+        "isOnlineMeeting": True,
+        "transactionId": str(uuid.uuid4()),
+    }
+    status, data = await _json_request(session, 'POST', f"{GRAPH_API}/me/events", user_id, 'outlook', headers, json=payload)
+    if status in (200, 201):
+        return True, (data.get("onlineMeeting") or {}).get("joinUrl"), status, None
+    return False, None, status, _error_message(data, 'Unknown')
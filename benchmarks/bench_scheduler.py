@@ -0,0 +1,353 @@
+"""
+Benchmarks for the pain engine and best-slot search on synthetic rosters.
+
+    python -m benchmarks.bench_scheduler                  # full grid
+    python -m benchmarks.bench_scheduler --sizes 25 100 --days 30 90 --repeat 5
+
+Rosters are generated at the member limits of each pricing tier with mixed
+timezones (DST and half-hour zones included), work hours and calendar conflict
+densities. For every case it reports median latency, peak traced memory and
+the memory allocated over the call, temporaries included, for both
+nync_core and the original per-cell reference in benchmarks/reference.py.
+Conflicts are generated as busy intervals and expanded to the reference's
+hour-keyed dicts, so both engines see the same calendar.
+
+Every case is also differential-checked: pain cells, heatmap rows and the
+top-3 ranking from nync_core must equal the reference exactly. On the first
+few members, best_slots at 60/30/15-minute slots and with meetings longer than
+a slot, the pareto_slots front and a multi-week plan_rotation are checked
+against brute-force scoring built on the reference's pain rules. Any mismatch
+is listed and the run exits with status 1.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pytz
+
+import nync_core
+from benchmarks import reference
+from nync_core.tz_offsets import EPOCH, to_epoch_minutes
+
+CORE_DIR = os.path.dirname(nync_core.__file__)
+
+# Member caps per tier, mirroring TIER_LIMITS in modules/team.py
+TIER_SIZES = {'free': 3, 'squad': 10, 'guild': 25, 'empire': 100}
+HORIZONS = (1, 7, 30, 90)
+DENSITIES = (0.0, 0.1, 0.3)
+
+TIMEZONES = [
+    "UTC", "America/New_York", "America/Los_Angeles", "America/Sao_Paulo", "America/St_Johns",
+    "Europe/London", "Europe/Berlin", "Europe/Moscow", "Africa/Lagos", "Asia/Dubai", "Asia/Tehran",
+    "Asia/Kolkata", "Asia/Kathmandu", "Asia/Singapore", "Asia/Tokyo", "Australia/Adelaide",
+    "Australia/Sydney", "Pacific/Auckland", "Pacific/Honolulu",
+]
+WORK_HOURS = [(9, 17), (8, 16), (10, 18), (7, 15), (12, 20), (6, 14), (9, 13), (0, 8)]
+# Brute-force checks are quadratic-ish, so they run on the first few members over a short horizon
+BRUTE_MEMBERS = 6
+BRUTE_DAYS = 2
+BRUTE_CASES = ((60, 60), (60, 90), (30, 30), (30, 45), (15, 15), (15, 60))
+
+
+def make_roster(size, rng):
+    roster = []
+    for i in range(size):
+        w_start, w_end = rng.choice(WORK_HOURS)
+        connected = rng.random() < 0.7
+        roster.append({
+            'id': i, 'user_id': f"user-{i}" if connected else None, 'role': 'member' if connected else 'ghost',
+            'email': f"member{i}@example.com", 'name': f"member{i}",
+            'tz': rng.choice(TIMEZONES), 'work_start': w_start, 'work_end': w_end,
+        })
+    return roster
+
+
+def make_conflicts(roster, start_date, days, density, rng):
+    """Hour-long events as the {user_id: BusyIntervals} map gather_all_conflicts returns."""
+    start = dt.datetime.combine(start_date, dt.time.min)
+    conflicts = {}
+    for m in roster:
+        if not m['user_id'] or not density:
+            continue
+        busy = nync_core.BusyIntervals()
+        for h in range(24 * days):
+            if rng.random() < density:
+                slot = start + dt.timedelta(hours=h)
+                busy.add(slot, slot + dt.timedelta(hours=1), f"Meeting {h % 7}")
+        conflicts[m['user_id']] = busy
+    return conflicts
+
+
+def hourly_conflicts(conflicts):
+    """The same events in the reference's {user_id: {iso_hour: title}} shape."""
+    hourly = {}
+    for uid, busy in conflicts.items():
+        hours = hourly[uid] = {}
+        for start, end, title in busy:
+            for minute in range(start, end, 60):
+                hours[(EPOCH + dt.timedelta(minutes=minute)).isoformat()] = title
+    return hourly
+
+
+def local_pain(member, utc_dt):
+    """Reference pain at any UTC instant: the reference rules applied to the member's wall clock."""
+    try:
+        local = pytz.utc.localize(utc_dt).astimezone(pytz.timezone(member['tz']))
+    except Exception:
+        return 0
+    return reference.calculate_local_pain(local.date(), local.hour, 'UTC', member['work_start'], member['work_end'])
+
+
+def brute_windows(roster, conflicts, history, start_date, days, slot_minutes=60, duration_minutes=60):
+    """
+    (total_pain, conflicts, fairness_gap, member_pains) for a meeting starting at every
+    slot, scored member by member and slot by slot without any nync_core code.
+    """
+    width = max(1, -(-duration_minutes // slot_minutes))
+    n_starts = days * 1440 // slot_minutes
+    n_slots = n_starts + width - 1
+    start = dt.datetime.combine(start_date, dt.time.min)
+    first = to_epoch_minutes(start)
+    step = dt.timedelta(minutes=slot_minutes)
+
+    slot_pain, slot_busy = [], []
+    for m in roster:
+        slot_pain.append([local_pain(m, start + s * step) for s in range(n_slots)])
+        busy = [False] * n_slots
+        for ev_start, ev_end, _ in (conflicts.get(m['user_id']) or []) if m['user_id'] else []:
+            for s in range(n_slots):
+                if ev_start < first + (s + 1) * slot_minutes and ev_end > first + s * slot_minutes:
+                    busy[s] = True
+        slot_busy.append(busy)
+
+    windows = []
+    for w in range(n_starts):
+        pains, clashes = [], 0
+        for i, m in enumerate(roster):
+            pain = -(-sum(slot_pain[i][w:w + width]) // width)
+            if any(slot_busy[i][w:w + width]):
+                pain += nync_core.CONFLICT_PENALTY
+                clashes += 1
+            pains.append(pain)
+        lifetime = [history.get(m['email'], 0) + p for m, p in zip(roster, pains)]
+        windows.append((sum(pains), clashes, max(lifetime) - min(lifetime), pains))
+    return windows
+
+
+def brute_front(windows):
+    """Non-dominated (index, total, conflicts, gap) by pairwise comparison, like pareto_slots orders them."""
+    points = np.array([(c, g, t) for t, c, g, _ in windows])
+    front, seen = [], set()
+    for i, p in enumerate(points):
+        key = tuple(p.tolist())
+        if key in seen:
+            continue
+        dominated = ((points <= p).all(axis=1) & (points < p).any(axis=1)).any()
+        if not dominated:
+            seen.add(key)
+            front.append((i, windows[i][0], windows[i][1], windows[i][2]))
+    return sorted(front, key=lambda f: (f[2], f[3], f[1], f[0]))
+
+
+def check_rotation(roster, history, start_date, density, rng):
+    """plan_rotation over 2 and 3 weeks against exhaustive search and brute-force window scores."""
+    problems = []
+    conflicts = make_conflicts(roster, start_date, 21, max(density, 0.2), rng)
+    weeks = [brute_windows(roster, conflicts, history, start_date + dt.timedelta(days=7 * n), 7) for n in range(3)]
+    per_week = len(weeks[0])
+    hist = np.array([history.get(m['email'], 0) for m in roster])
+
+    def plan_key(picks):
+        pains = sum(np.array(weeks[n][idx - n * per_week][3]) for n, (idx, _, _) in enumerate(picks))
+        overlaps = sum(weeks[n][idx - n * per_week][1] for n, (idx, _, _) in enumerate(picks))
+        return overlaps, int((hist + pains).max()), int(pains.sum())
+
+    for occurrences in (2, 3):
+        try:
+            plan = nync_core.plan_rotation(roster, conflicts, history, start_date, occurrences)
+        except Exception as e:
+            problems.append(f"rotation of {occurrences} failed: {e!r}")
+            continue
+        expected_pain = [0] * len(roster)
+        for n, (idx, total, clashes) in enumerate(plan['occurrences']):
+            total_ref, clashes_ref, _, pains = weeks[n][idx - n * per_week]
+            if not n * per_week <= idx < (n + 1) * per_week or (total, clashes) != (total_ref, clashes_ref):
+                problems.append(f"rotation week {n} pick {idx}: ({total}, {clashes}) != ({total_ref}, {clashes_ref})")
+            expected_pain = [a + b for a, b in zip(expected_pain, pains)]
+        if len(plan['occurrences']) != occurrences or plan['member_pain'] != expected_pain:
+            problems.append(f"rotation of {occurrences}: member pain {plan['member_pain']} != {expected_pain}")
+
+    # A beam as wide as a week keeps every first pick, so two weeks must reach the exhaustive optimum
+    pains = [np.array([w[3] for w in week]).T for week in weeks[:2]]
+    series = pains[0][:, :, None] + pains[1][:, None, :]
+    overlaps = np.array([w[1] for w in weeks[0]])[:, None] + np.array([w[1] for w in weeks[1]])[None, :]
+    worst = (hist[:, None, None] + series).max(axis=0)
+    total = series.sum(axis=0)
+    best = min(zip(overlaps.ravel().tolist(), worst.ravel().tolist(), total.ravel().tolist()))
+    try:
+        wide = nync_core.plan_rotation(roster, conflicts, history, start_date, 2, beam_width=per_week)
+    except Exception as e:
+        return problems + [f"rotation of 2 failed: {e!r}"]
+    if plan_key(wide['occurrences']) != best:
+        problems.append(f"rotation optimum {plan_key(wide['occurrences'])} != exhaustive {best}")
+    return problems
+
+
+def make_history(roster, rng):
+    return {m['email']: rng.choice([0, 0, 10, 40, 120, 300]) for m in roster}
+
+
+def allocated(fn):
+    """
+    KiB allocated over fn(): traced memory growth summed between every call and C call,
+    and every line run inside nync_core, so temporaries freed before fn returns still
+    count. Allocations released within one step net out, making it a lower bound.
+    """
+    grown = last = 0
+
+    def step(*_):
+        nonlocal grown, last
+        current = tracemalloc.get_traced_memory()[0]
+        grown += max(0, current - last)
+        last = current
+
+    def trace(frame, event, arg):
+        step()
+        return trace if frame.f_code.co_filename.startswith(CORE_DIR) else None
+
+    tracemalloc.start()
+    last = tracemalloc.get_traced_memory()[0]
+    sys.setprofile(step)
+    sys.settrace(trace)
+    try:
+        fn()
+    finally:
+        sys.settrace(None)
+        sys.setprofile(None)
+        tracemalloc.stop()
+    return grown / 1024
+
+
+def measure(fn, repeat, count_alloc=True):
+    """(median seconds, peak KiB above the starting level, KiB allocated or None) for fn()."""
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), (peak - base) / 1024, allocated(fn) if count_alloc else None
+
+
+def differential_check(roster, conflicts, history, start_date, days, density=0.0):
+    """Lists every way nync_core disagrees with the reference on this case."""
+    problems = []
+
+    pain = nync_core.pain_matrix(roster, start_date, days)
+    for i, m in enumerate(roster):
+        for s in range(24 * days):
+            day, hour = start_date + dt.timedelta(days=s // 24), s % 24
+            expected = reference.calculate_local_pain(day, hour, m['tz'], m['work_start'], m['work_end'])
+            if pain[i, s] != expected:
+                problems.append(f"pain {m['tz']} {m['work_start']}-{m['work_end']} {day} {hour:02d}:00: "
+                                f"{pain[i, s]} != {expected}")
+
+    hourly = hourly_conflicts(conflicts)
+    rows = nync_core.heatmap_rows(roster, conflicts, start_date)
+    for row in rows:
+        row.pop('Minute')
+    if rows != reference.build_heatmap_rows(start_date, roster, hourly):
+        problems.append("heatmap rows differ")
+
+    fields = ('date', 'hour', 'time_str', 'total_pain', 'conflicts', 'fairness_gap')
+    ours = [{k: s[k] for k in fields} for s in nync_core.best_slots(roster, conflicts, history, start_date, days)]
+    theirs = reference.get_best_slots(roster, start_date, days, hourly, history)
+    if ours != theirs:
+        problems.append(f"ranking differs: {ours} != {theirs}")
+
+    small, brute_days = roster[:BRUTE_MEMBERS], min(days, BRUTE_DAYS)
+    fields = ('total_pain', 'conflicts', 'fairness_gap')
+    for slot_minutes, duration in BRUTE_CASES:
+        windows = brute_windows(small, conflicts, history, start_date, brute_days, slot_minutes, duration)
+        order = sorted(range(len(windows)), key=lambda w: (windows[w][1] > 0, windows[w][2], windows[w][0], w))
+        theirs = [(w * slot_minutes, *windows[w][:3]) for w in order[:3]]
+        slots = nync_core.best_slots(small, conflicts, history, start_date, brute_days, slot_minutes, duration)
+        start = dt.datetime.combine(start_date, dt.time.min)
+        ours = [(int((dt.datetime.combine(s['date'], dt.time(s['hour'], s['minute'])) - start).total_seconds() // 60),
+                 s['total_pain'], s['conflicts'], s['fairness_gap']) for s in slots]
+        if ours != theirs:
+            problems.append(f"{slot_minutes}-min ranking for {duration}-min meetings differs: {ours} != {theirs}")
+
+        front = nync_core.pareto_slots(small, conflicts, history, start_date, brute_days, slot_minutes, duration)
+        if front != brute_front(windows):
+            problems.append(f"{slot_minutes}-min trade-off front for {duration}-min meetings differs: "
+                            f"{front[:3]} != {brute_front(windows)[:3]}")
+
+    problems += check_rotation(roster[:BRUTE_MEMBERS - 1], history, start_date, density,
+                               random.Random(f"rotation-{len(roster)}-{days}-{density}"))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_scheduler", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(TIER_SIZES.values()))
+    parser.add_argument("--days", type=int, nargs="+", default=list(HORIZONS))
+    parser.add_argument("--densities", type=float, nargs="+", default=list(DENSITIES))
+    parser.add_argument("--start", type=dt.date.fromisoformat, default=dt.date(2026, 3, 1),
+                        help="first day; the default horizon crosses the US and EU spring DST changes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per nync_core case")
+    parser.add_argument("--reference-repeat", type=int, default=1, help="timed runs per reference case")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-check", action="store_true", help="skip the differential check")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the traced allocation count, which is slow")
+    args = parser.parse_args(argv)
+
+    header = f"{'members':>7} {'days':>4} {'density':>7} {'engine':>9} {'ms':>10} {'peak KiB':>10} {'alloc KiB':>10} {'speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    failures = []
+    for size in args.sizes:
+        for days in args.days:
+            for density in args.densities:
+                rng = random.Random(f"{args.seed}-{size}-{days}-{density}")
+                roster = make_roster(size, rng)
+                conflicts = make_conflicts(roster, args.start, days, density, rng)
+                hourly = hourly_conflicts(conflicts)
+                history = make_history(roster, rng)
+
+                core = measure(lambda: nync_core.best_slots(roster, conflicts, history, args.start, days),
+                               args.repeat, not args.no_alloc)
+                ref = measure(lambda: reference.get_best_slots(roster, args.start, days, hourly, history),
+                              args.reference_repeat, not args.no_alloc)
+                for name, (secs, peak, alloc), speedup in (("reference", ref, ""),
+                                                            ("nync_core", core, f"{ref[0] / core[0]:.1f}x")):
+                    print(f"{size:>7} {days:>4} {density:>7.2f} {name:>9} {secs * 1000:>10.2f} "
+                          f"{peak:>10.1f} {'-' if alloc is None else f'{alloc:.1f}':>10} {speedup:>8}")
+
+                if not args.no_check:
+                    problems = differential_check(roster, conflicts, history, args.start, days, density)
+                    failures += [f"[{size} members, {days}d, density {density}] {p}" for p in problems[:5]]
+
+    if failures:
+        print(f"\n{len(failures)} differential mismatch(es):")
+        for f in failures:
+            print("  " + f)
+        return 1
+    if not args.no_check:
+        print("\nDifferential check passed: nync_core matches the reference on every case.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
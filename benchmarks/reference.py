@@ -0,0 +1,102 @@
+"""
+Reference scheduler: the original per-cell implementation, kept verbatim
+(minus Streamlit caching and JSON plumbing) so faster engines can be
+checked against it cell for cell and rank for rank. Hourly slots only.
+"""
+import datetime as dt
+import pytz
+
+
+def calculate_local_pain(target_date, hour, user_tz_str, work_start=9, work_end=17):
+    try:
+        user_tz = pytz.timezone(user_tz_str)
+        utc_time = dt.datetime.combine(target_date, dt.time(hour=hour)).replace(tzinfo=pytz.UTC)
+        local_time = utc_time.astimezone(user_tz)
+        local_hour = local_time.hour
+        is_weekend = local_time.weekday() >= 5
+
+        if work_start <= local_hour < work_end:
+            base_pain = 0
+        elif (work_start - 1) <= local_hour < work_start or work_end <= local_hour < (work_end + 1):
+            base_pain = 1
+        elif (work_start - 2) <= local_hour < (work_start - 1) or (work_end + 1) <= local_hour < (work_end + 3):
+            base_pain = 3
+        elif (work_start - 3) <= local_hour < (work_start - 2) or (work_end + 3) <= local_hour < (work_end + 5):
+            base_pain = 5
+        else:
+            base_pain = 10
+
+        if is_weekend:
+            return min(10, base_pain + 8)
+        return base_pain
+    except:
+        return 0
+
+
+def build_heatmap_rows(target_date, roster, conflicts_dict):
+    data = []
+    for h in range(24):
+        display_time = f"{h:02d}:00 UTC"
+        for member in roster:
+            name = member.get('name', 'Unknown')
+            tz = member.get('tz', 'UTC')
+            w_start = member.get('work_start', 9)
+            w_end = member.get('work_end', 17)
+            uid = str(member.get('user_id', ''))
+            pain = calculate_local_pain(target_date, h, tz, w_start, w_end)
+            slot_str = dt.datetime.combine(target_date, dt.time(hour=h)).isoformat()
+            event_title = "Clear"
+            if uid in conflicts_dict and slot_str in conflicts_dict[uid]:
+                pain += 25
+                event_title = conflicts_dict[uid][slot_str]
+            data.append({
+                "Time": display_time, "Hour": h,
+                "Member": name, "Pain Score": pain, "Local Timezone": tz,
+                "Event": event_title
+            })
+    return data
+
+
+def get_best_slots(roster, start_date, days=7, conflicts_dict=None, history_map=None):
+    conflicts_dict = conflicts_dict or {}
+    history_map = history_map or {}
+    best_slots = []
+
+    for day_offset in range(days):
+        current_date = start_date + dt.timedelta(days=day_offset)
+        for h in range(24):
+            slot_dt_naive = dt.datetime.combine(current_date, dt.time(hour=h))
+            slot_str = slot_dt_naive.isoformat()
+            total_pain = 0
+            conflict_count = 0
+            lifetime_balances = []
+
+            for m in roster:
+                w_start = m.get('work_start', 9)
+                w_end = m.get('work_end', 17)
+                email = m.get('email', '')
+                pain = calculate_local_pain(current_date, h, m.get('tz', 'UTC'), w_start, w_end)
+                uid = m.get('user_id')
+
+                if uid and str(uid) in conflicts_dict:
+                    if slot_str in conflicts_dict[str(uid)]:
+                        pain += 25
+                        conflict_count += 1
+
+                total_pain += pain
+                projected = history_map.get(email, 0) + pain
+                lifetime_balances.append(projected)
+
+            fairness_gap = (max(lifetime_balances) - min(lifetime_balances)) if lifetime_balances else 0
+
+            best_slots.append({
+                'date': current_date,
+                'hour': h,
+                'time_str': f"{h:02d}:00 UTC",
+                'total_pain': total_pain,
+                'conflicts': conflict_count,
+                'fairness_gap': fairness_gap,
+            })
+
+    best_slots.sort(key=lambda x: (x['conflicts'] > 0, x['fairness_gap'], x['total_pain']))
+    return best_slots[:3]
@@ -0,0 +1,269 @@
+import datetime as dt
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+import streamlit as st
+from nync_core.busy_intervals import BusyIntervals
+from nync_core.tz_offsets import EPOCH, to_epoch_minutes
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Seconds a synced date range stays fresh before the next view refetches it
+CONFLICT_TTL = int(os.environ.get("NYNC_CONFLICT_TTL", 300))
+# Idle teams drop out of the cache after a day
+TEAM_ENTRY_TTL = 24 * 3600
+
+
+class MemberCalendar:
+    """
+    One member's cached busy intervals plus the sorted, disjoint [start, end, expires_at]
+    ranges (epoch minutes, wall-clock expiry) they are known to be complete for.
+    """
+    __slots__ = ('ranges', 'busy')
+
+    def __init__(self, ranges=(), busy=None):
+        self.ranges = [list(r) for r in ranges]
+        self.busy = BusyIntervals.coerce(busy) if busy is not None else BusyIntervals()
+
+    def copy(self):
+        return MemberCalendar(self.ranges, BusyIntervals(self.busy))
+
+    def gaps(self, start, end, now):
+        """Parts of [start, end) not covered by an unexpired range."""
+        gaps, cursor = [], start
+        for s, e, expires_at in self.ranges:
+            if expires_at <= now or e <= cursor:
+                continue
+            if s >= end:
+                break
+            if s > cursor:
+                gaps.append((cursor, s))
+            cursor = max(cursor, e)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def fill(self, start, end, busy, now, expires_at):
+        """
+        Replaces what is known about [start, end) with a fresh fetch and drops expired ranges.
+        Events the provider returns past either edge are clipped, since only [start, end) is covered.
+        """
+        kept = []
+        for s, e, exp in self.ranges:
+            if exp <= now:
+                self.busy.remove(s, e)
+            elif e <= start or s >= end:
+                kept.append([s, e, exp])
+            else:
+                if s < start:
+                    kept.append([s, start, exp])
+                if e > end:
+                    kept.append([end, e, exp])
+        self.busy.remove(start, end)
+        self.busy.update(BusyIntervals.coerce(busy).clip(start, end))
+        kept.append([start, end, expires_at])
+        self.ranges = sorted(kept)
+
+    def to_json(self):
+        return {'ranges': self.ranges, 'busy': self.busy.to_json()}
+
+
+class MemoryBackend:
+    """Process-wide dict shared by every Streamlit session in this server."""
+
+    def __init__(self):
+        self._data = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if not entry or entry[0] < time.monotonic():
+                self._data.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def generation(self, key):
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def bump(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+
+class RedisBackend:
+    """
+    Same interface over any Redis-compatible client (get / set with ex= / delete / incr),
+    so several app servers share one cache. Team entries are stored as JSON.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        raw = self.client.get(key)
+        if raw is None:
+            return None
+        return {uid: MemberCalendar(**cal) for uid, cal in json.loads(raw).items()}
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps({uid: cal.to_json() for uid, cal in value.items()}), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def generation(self, key):
+        return int(self.client.get(f"{key}:gen") or 0)
+
+    def bump(self, key):
+        self.client.incr(f"{key}:gen")
+        self.client.expire(f"{key}:gen", TEAM_ENTRY_TTL)
+
+
+class ConflictCache:
+    """
+    Per-team cache of each member's busy intervals and the date ranges they cover. A query
+    is answered from coverage and only the missing or expired days are fetched, for just the
+    members that lack them. Concurrent fetches for the same team in this process wait on one
+    in-flight fetch, then re-check coverage, instead of fanning out again.
+    """
+
+    def __init__(self, backend, ttl=CONFLICT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(team_id):
+        return f"conflicts:{team_id}"
+
+    @staticmethod
+    def _missing(entry, user_ids, start, end, now):
+        """{(gap_start, gap_end): [user_id, ...]} for every uncovered day range."""
+        missing = {}
+        for uid in user_ids:
+            cal = entry.get(uid) or MemberCalendar()
+            for gap in cal.gaps(start, end, now):
+                missing.setdefault(gap, []).append(uid)
+        return missing
+
+    def get_or_fetch(self, team_id, roster, start_date, days, fetch):
+        """
+        ({user_id: BusyIntervals} clipped to start_date + days, [unreadable user_id, ...]).
+        `fetch(members, start_date, days)` returns the same map for a sub-roster and is only
+        called for missing ranges; members it leaves out are not cached and are reported as
+        unreadable, since their calendar may not be free.
+        """
+        key = self.key(team_id)
+        start = to_epoch_minutes(dt.datetime.combine(start_date, dt.time.min))
+        end = start + days * 1440
+        user_ids = [str(m['user_id']) for m in roster if m.get('user_id')]
+
+        while True:
+            entry = self.backend.get(key) or {}
+            if not self._missing(entry, user_ids, start, end, time.time()):
+                return self._view(entry, user_ids, start, end), []
+
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = Future()
+            if not leader:
+                lead_start, lead_end, lead_ids, entry = flight.result()
+                # The leader just tried everything this request needs; refetching now would only
+                # repeat its failures one waiting session after another
+                if lead_start <= start and end <= lead_end and lead_ids.issuperset(user_ids):
+                    return self._view(entry, user_ids, start, end), self._unreadable(entry, user_ids, start, end)
+                continue
+
+            try:
+                entry = self._fill(key, roster, start, end, fetch)
+                flight.set_result((start, end, set(user_ids), entry))
+                # Members the fetch could not read stay uncovered for the next view to retry
+                return self._view(entry, user_ids, start, end), self._unreadable(entry, user_ids, start, end)
+            except Exception as e:
+                flight.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    @staticmethod
+    def _view(entry, user_ids, start, end):
+        return {uid: entry[uid].busy.clip(start, end) for uid in user_ids if uid in entry}
+
+    def _unreadable(self, entry, user_ids, start, end):
+        """Members still missing part of [start, end) after a fetch, in roster order."""
+        missing = {uid for uids in self._missing(entry, user_ids, start, end, time.time()).values() for uid in uids}
+        return [uid for uid in user_ids if uid in missing]
+
+    def _fill(self, key, roster, start, end, fetch):
+        generation = self.backend.generation(key)
+        # Work on copies so sessions reading the current entry never see a half-applied fetch
+        entry = dict(self.backend.get(key) or {})
+        now = time.time()
+        by_uid = {str(m['user_id']): m for m in roster if m.get('user_id')}
+        filled = set()
+        for (gap_start, gap_end), uids in self._missing(entry, list(by_uid), start, end, now).items():
+            gap_date = (EPOCH + dt.timedelta(minutes=gap_start)).date()
+            fetched = fetch([by_uid[uid] for uid in uids], gap_date, (gap_end - gap_start) // 1440)
+            for uid in uids:
+                if uid not in fetched:
+                    continue
+                cal = entry[uid].copy() if uid in entry else MemberCalendar()
+                cal.fill(gap_start, gap_end, fetched[uid], now, now + self.ttl)
+                entry[uid] = cal
+                filled.add(uid)
+
+        # Merge into the entry as it is now, so writes from other fetches survive. If a push or
+        # sync invalidated anything during the fetch, these results may predate the change:
+        # they answer this request but are not cached
+        if self.backend.generation(key) == generation:
+            current = dict(self.backend.get(key) or {})
+            current.update({uid: entry[uid] for uid in filled})
+            self.backend.set(key, current, TEAM_ENTRY_TTL)
+        return entry
+
+    def invalidate(self, team_id):
+        # Bumped first so a fetch finishing meanwhile doesn't write its older results back
+        self.backend.bump(self.key(team_id))
+        self.backend.delete(self.key(team_id))
+
+    def invalidate_member(self, team_id, user_id):
+        """Forgets one member's calendar so the next view refetches just them."""
+        key = self.key(team_id)
+        self.backend.bump(key)
+        entry = self.backend.get(key)
+        if entry and str(user_id) in entry:
+            self.backend.set(key, {uid: cal for uid, cal in entry.items() if uid != str(user_id)}, TEAM_ENTRY_TTL)
+
+
+@st.cache_resource
+def get_conflict_cache():
+    """Redis-backed when NYNC_REDIS_URL is set and redis is installed, otherwise in-process."""
+    url = os.environ.get("NYNC_REDIS_URL")
+    if url and redis:
+        try:
+            client = redis.Redis.from_url(url)
+            client.ping()
+            return ConflictCache(RedisBackend(client))
+        except Exception as e:
+            print(f"[nync] Redis unavailable, using in-process conflict cache: {e}")
+    return ConflictCache(MemoryBackend())
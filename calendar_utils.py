@@ -3,6 +3,9 @@ import requests
 import datetime as dt
 import re
 from db import supabase
+from nync_core.tz_offsets import EPOCH
+from async_calendar_utils import (run_on_provider_loop, fetch_member_busy, refresh_connection,
+                                  book_google_meeting_async, book_outlook_meeting_async)
 
 # --- SAFE EMAIL VALIDATOR ---
 def is_valid_email(email):
@@ -10,6 +13,20 @@ def is_valid_email(email):
     if not email: return False
     return bool(re.match(r"[^@]+@[^@]+\.[^@]+", str(email).strip()))
 
+def floor_to_slot(t, slot_minutes=60):
+    """Truncates a naive UTC datetime to the start of its scheduling slot"""
+    return t.replace(minute=t.minute - t.minute % slot_minutes, second=0, microsecond=0)
+
+def busy_slots(busy, slot_minutes=60):
+    """Start of every slot a BusyIntervals touches, as naive UTC datetimes"""
+    slots = []
+    for start, end, _ in busy:
+        curr = floor_to_slot(EPOCH + dt.timedelta(minutes=start), slot_minutes)
+        while curr < EPOCH + dt.timedelta(minutes=end):
+            slots.append(curr)
+            curr += dt.timedelta(minutes=slot_minutes)
+    return slots
+
 def get_provider_token(user_id, provider):
     """Safely retrieves the CURRENT access token without forcing a refresh"""
     if not supabase: return None
@@ -67,114 +84,32 @@ def handle_microsoft_callback(code, user_id):
         except: return False
     except: return False
 
+# Provider calls run on the shared async client (async_calendar_utils); these are its blocking wrappers
 def refresh_outlook_token(user_id):
     if not supabase: return None
-    try:
-        record = supabase.table("calendar_connections").select("*").eq("user_id", user_id).eq("provider", "outlook").single().execute()
-        if not record.data: return None
-        refresh_token = record.data.get("refresh_token")
-        
-        token_url = f"{st.secrets['microsoft']['authority']}/oauth2/v2.0/token"
-        payload = {
-            "client_id": st.secrets["microsoft"]["client_id"],
-            "client_secret": st.secrets["microsoft"]["client_secret"],
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token",
-            "scope": "Calendars.ReadWrite offline_access User.Read"
-        }
-        r = requests.post(token_url, data=payload, timeout=10)
-        new_tokens = r.json()
-        if "access_token" not in new_tokens: return None
-            
-        import datetime as _dt
-        exp_secs = new_tokens.get("expires_in", 3600)
-        expires_at = (_dt.datetime.utcnow() + _dt.timedelta(seconds=exp_secs)).isoformat()
-        supabase.table("calendar_connections").update({
-            "access_token": new_tokens["access_token"],
-            "refresh_token": new_tokens.get("refresh_token", refresh_token),
-            "expires_in": exp_secs,
-            "expires_at": expires_at
-        }).eq("user_id", user_id).execute()
-        return new_tokens["access_token"]
+    try: return run_on_provider_loop(refresh_connection(user_id, "outlook"))
     except: return None
 
-def fetch_outlook_events(user_id, start_dt, end_dt):
+def fetch_outlook_events(user_id, start_dt, end_dt, slot_minutes=60):
     if not supabase or not user_id: return []
     try:
-        response = supabase.table("calendar_connections").select("access_token").eq("user_id", user_id).eq("provider", "outlook").maybe_single().execute()
-        if not response or not response.data: return []
-        token = response.data.get('access_token')
-
-        headers = {"Authorization": f"Bearer {token}", "Prefer": "outlook.timezone=\"UTC\""}
-        start_str = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        end_str = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        endpoint = f"https://graph.microsoft.com/v1.0/me/calendarview?startDateTime={start_str}&endDateTime={end_str}&$select=subject,start,end,showAs"
-        
-        try:
-            r = requests.get(endpoint, headers=headers, timeout=5)
-            if r.status_code == 401:
-                new_token = refresh_outlook_token(user_id)
-                if new_token:
-                    headers["Authorization"] = f"Bearer {new_token}"
-                    r = requests.get(endpoint, headers=headers, timeout=5)
-                else: return [] 
-            if r.status_code != 200:
-                st.toast("⚠️ Could not sync live Outlook calendar, using cached availability.")
-                return []
-        except requests.exceptions.Timeout:
-            st.toast("⏱️ Outlook API timed out, using cached availability.")
-            return []
-        except Exception:
-            st.toast("⚠️ Could not sync live Outlook calendar, using cached availability.")
-            return []
-        
-        events = r.json().get('value', [])
-        blocked_hours = []
-        for e in events:
-            start = dt.datetime.fromisoformat(e['start']['dateTime'].replace('Z', '+00:00'))
-            end = dt.datetime.fromisoformat(e['end']['dateTime'].replace('Z', '+00:00'))
-            curr = start
-            while curr < end:
-                blocked_hours.append(curr.replace(minute=0, second=0, microsecond=0))
-                curr += dt.timedelta(hours=1)
-        return blocked_hours
-    except: return []
+        busy = run_on_provider_loop(fetch_member_busy(user_id, "outlook", start_dt, end_dt))
+    except Exception:
+        busy = None
+    if busy is None:
+        st.toast("⚠️ Could not sync live Outlook calendar, using cached availability.")
+        return []
+    return busy_slots(busy, slot_minutes)
 
 def book_outlook_meeting(user_id, subject, start_dt_utc, duration_minutes, attendees):
     if not supabase: return False, None
     try:
-        token = get_provider_token(user_id, "outlook") 
-        if not token: return False, None
-
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-        end_dt_utc = start_dt_utc + dt.timedelta(minutes=duration_minutes)
-        
-        attendee_list = [{"emailAddress": {"address": email.strip()}, "type": "required"} for email in attendees if is_valid_email(email)]
-
-        start_str = start_dt_utc.strftime("%Y-%m-%dT%H:%M:%S")
-        end_str = end_dt_utc.strftime("%Y-%m-%dT%H:%M:%S")
-
-        payload = {
-            "subject": subject,
-            "start": {"dateTime": start_str, "timeZone": "UTC"},
-            "end": {"dateTime": end_str, "timeZone": "UTC"},
-            "attendees": attendee_list,
-            "isOnlineMeeting": True 
-        }
-
-        r = requests.post("https://graph.microsoft.com/v1.0/me/events", headers=headers, json=payload, timeout=10)
-        
-        if r.status_code == 401:
-            token = refresh_outlook_token(user_id)
-            if token:
-                headers["Authorization"] = f"Bearer {token}"
-                r = requests.post("https://graph.microsoft.com/v1.0/me/events", headers=headers, json=payload, timeout=10)
-
-        if r.status_code in [201, 200]:
-            return True, r.json().get("onlineMeeting", {}).get("joinUrl")
-        else:
-            st.toast(f"Outlook Error {r.status_code}: {r.json().get('error', {}).get('message', 'Unknown')}")
-            return False, None
+        emails = [email.strip() for email in attendees if is_valid_email(email)]
+        booked, join_url, status, error = run_on_provider_loop(
+            book_outlook_meeting_async(user_id, subject, start_dt_utc, duration_minutes, emails))
+        if not booked and status:
+            st.toast(f"Outlook Error {status}: {error}")
+        return booked, join_url
     except Exception as e: 
         print(f"Failed to book outlook meeting: {e}")
         return False, None
@@ -235,138 +170,31 @@ def save_google_token(user_id, session):
         return False
 
 def refresh_google_token(user_id):
-    if not supabase: return None
-    try:
-        record = supabase.table("calendar_connections").select("*").eq("user_id", user_id).eq("provider", "google").single().execute()
-        if not record.data or not record.data.get("refresh_token"): 
-            return None
-        
-        if "google" not in st.secrets: return None
-        
-        refresh_token = record.data.get("refresh_token")
-        token_url = "https://oauth2.googleapis.com/token"
-        
-        payload = {
-            "client_id": st.secrets["google"]["client_id"],
-            "client_secret": st.secrets["google"]["client_secret"],
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token"
-        }
-        
-        r = requests.post(token_url, data=payload, timeout=10)
-        new_tokens = r.json()
-        
-        if "access_token" not in new_tokens: 
-            return None
-        
-        import datetime as _dt
-        exp_secs = new_tokens.get("expires_in", 3599)
-        expires_at = (_dt.datetime.utcnow() + _dt.timedelta(seconds=exp_secs)).isoformat()
-        supabase.table("calendar_connections").update({
-            "access_token": new_tokens["access_token"],
-            "expires_in": exp_secs,
-            "expires_at": expires_at
-        }).eq("user_id", user_id).eq("provider", "google").execute()
-        
-        return new_tokens["access_token"]
-    except Exception as e:
-        return None
+    if not supabase or "google" not in st.secrets: return None
+    try: return run_on_provider_loop(refresh_connection(user_id, "google"))
+    except: return None
 
-def fetch_google_events(user_id, start_dt, end_dt):
+def fetch_google_events(user_id, start_dt, end_dt, slot_minutes=60):
     if not supabase or not user_id: return []
     try:
-        response = supabase.table("calendar_connections").select("access_token").eq("user_id", user_id).eq("provider", "google").maybe_single().execute()
-        if not response or not response.data: return []
-        token = response.data.get('access_token')
-
-        start_str = start_dt.isoformat() + "Z"
-        end_str = end_dt.isoformat() + "Z"
-        
-        url = f"https://www.googleapis.com/calendar/v3/calendars/primary/events?timeMin={start_str}&timeMax={end_str}&singleEvents=true"
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        try:
-            r = requests.get(url, headers=headers, timeout=5)
-            
-            if r.status_code == 401:
-                new_token = refresh_google_token(user_id)
-                if new_token:
-                    headers = {"Authorization": f"Bearer {new_token}"}
-                    r = requests.get(url, headers=headers, timeout=5)
-                else: return []
-
-            if r.status_code != 200:
-                return []
-        except requests.exceptions.Timeout:
-            return []
-        except Exception:
-            return []
-        
-        items = r.json().get('items', [])
-        blocked_hours = []
-        for i in items:
-            if 'dateTime' not in i.get('start', {}): continue
-            
-            start = dt.datetime.fromisoformat(i['start']['dateTime'])
-            end = dt.datetime.fromisoformat(i['end']['dateTime'])
-            
-            if start.tzinfo: start = start.astimezone(dt.timezone.utc).replace(tzinfo=None)
-            if end.tzinfo: end = end.astimezone(dt.timezone.utc).replace(tzinfo=None)
-            
-            curr = start
-            while curr < end:
-                blocked_hours.append(curr.replace(minute=0, second=0, microsecond=0))
-                curr += dt.timedelta(hours=1)
-                
-        return blocked_hours
-    except: return []
+        busy = run_on_provider_loop(fetch_member_busy(user_id, "google", start_dt, end_dt))
+    except Exception:
+        busy = None
+    return busy_slots(busy, slot_minutes) if busy else []
 
 def book_google_meeting(user_id, subject, start_dt_utc, duration_minutes, attendees):
     if not supabase: return False, None
     try:
-        token = get_provider_token(user_id, "google")
-        if not token: 
+        emails = [email.strip() for email in attendees if is_valid_email(email)]
+        booked, meet_link, status, error = run_on_provider_loop(
+            book_google_meeting_async(user_id, subject, start_dt_utc, duration_minutes, emails))
+        if status is None:
             st.toast("❌ Google Calendar connection missing. Please reconnect in Settings.")
-            return False, None
-
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-        end_dt_utc = start_dt_utc + dt.timedelta(minutes=duration_minutes)
-        
-        attendee_list = [{"email": email.strip()} for email in attendees if is_valid_email(email)]
-
-        start_str = start_dt_utc.strftime("%Y-%m-%dT%H:%M:%S") + "Z"
-        end_str = end_dt_utc.strftime("%Y-%m-%dT%H:%M:%S") + "Z"
-
-        payload = {
-            "summary": subject,
-            "start": {"dateTime": start_str},
-            "end": {"dateTime": end_str},
-            "attendees": attendee_list,
-            "conferenceData": {
-                "createRequest": {
-                    "requestId": f"nync_{user_id}_{int(dt.datetime.now().timestamp())}",
-                    "conferenceSolutionKey": {"type": "hangoutsMeet"}
-                }
-            }
-        }
-
-        url = "https://www.googleapis.com/calendar/v3/calendars/primary/events?sendUpdates=all&conferenceDataVersion=1"
-        r = requests.post(url, headers=headers, json=payload, timeout=10)
-        
-        if r.status_code == 401:
-            token = refresh_google_token(user_id)
-            if not token:
-                st.toast("❌ Google Calendar token completely expired. Disconnect & Reconnect in Settings.")
-                return False, None
-            headers["Authorization"] = f"Bearer {token}"
-            r = requests.post(url, headers=headers, json=payload, timeout=10)
-        
-        if r.status_code in [200, 201]:
-            return True, r.json().get("hangoutLink")
-        else:
-            error_msg = r.json().get('error', {}).get('message', 'Unknown API Error')
-            st.toast(f"Google API Error {r.status_code}: {error_msg}")
-            return False, None
+        elif status == 401:
+            st.toast("❌ Google Calendar token completely expired. Disconnect & Reconnect in Settings.")
+        elif not booked:
+            st.toast(f"Google API Error {status}: {error}")
+        return booked, meet_link
     except Exception as e: 
         print(f"Error booking Google Meeting: {e}")
         return False, None
\ No newline at end of file
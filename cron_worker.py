@@ -1,6 +1,7 @@
 import datetime
 from db import supabase
 import calendar_utils
+import webhook_utils
 
 
 def refresh_all_tokens():
@@ -45,3 +46,13 @@ def close_expired_polls():
             .execute()
     except Exception as e:
         print(f"[nync] close_expired_polls error: {e}")
+
+
+def renew_calendar_channels():
+    """Keep Google watch channels and Graph subscriptions open for every connected calendar."""
+    if not supabase:
+        return
+    try:
+        webhook_utils.renew_channels()
+    except Exception as e:
+        print(f"[nync] renew_calendar_channels error: {e}")
@@ -10,4 +10,15 @@ def get_supabase():
         return create_client(url, key)
     except: return None
 
-supabase = get_supabase()
\ No newline at end of file
+supabase = get_supabase()
+
+@st.cache_resource
+def get_service_supabase():
+    """Service-role client for background jobs that touch RLS-locked tables; None without a [supabase] service_key."""
+    try:
+        key = st.secrets["supabase"].get("service_key")
+        if not key: return None
+        return create_client(st.secrets["supabase"]["url"], key)
+    except: return None
+
+service_supabase = get_service_supabase()
\ No newline at end of file
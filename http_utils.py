@@ -0,0 +1,267 @@
+import asyncio
+import codecs
+import contextlib
+import email.utils
+import json
+import random
+import re
+import time
+import aiohttp
+
+# Concurrent requests in flight per provider, and per tenant (email domain) within a provider
+PROVIDER_CONCURRENCY = {"google": 20, "outlook": 20}
+TENANT_CONCURRENCY = 10
+REQUEST_TIMEOUT = 10
+# Retries for one request stop once this many seconds have passed since its first attempt
+RETRY_DEADLINE = 20
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+# Bytes read from a streamed response body at a time
+STREAM_CHUNK = 64 * 1024
+
+_provider_limits = {}
+_tenant_limits = {}
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider's circuit is open or a request ran out of retries."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed requests and fails fast for `cooldown`
+    seconds, then lets a single trial request through; its outcome closes or reopens it.
+    Only touched from the provider loop, so it needs no locking.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if not self.trial and time.monotonic() - self.opened_at >= self.cooldown:
+            self.trial = True
+            return True
+        return False
+
+    def record(self, ok):
+        self.trial = False
+        if ok:
+            self.failures, self.opened_at = 0, None
+            return
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+breakers = {"google": CircuitBreaker(), "outlook": CircuitBreaker()}
+
+
+def tenant_of(email):
+    """Tenant key for rate limiting: the domain of a member's email."""
+    return email.rsplit("@", 1)[-1].lower() if email and "@" in email else None
+
+def _limit(provider, tenant):
+    provider_limit = _provider_limits.setdefault(provider, asyncio.Semaphore(PROVIDER_CONCURRENCY.get(provider, 10)))
+    if not tenant:
+        return provider_limit, contextlib.nullcontext()
+    return provider_limit, _tenant_limits.setdefault((provider, tenant), asyncio.Semaphore(TENANT_CONCURRENCY))
+
+def retry_after(resp):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None."""
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+@contextlib.asynccontextmanager
+async def provider_request(session, method, url, provider, tenant=None, refresh=None, **kwargs):
+    """
+    session.request under the provider and tenant concurrency limits. 429s, 5xx and connection
+    errors are retried after Retry-After or a jittered backoff until RETRY_DEADLINE. Yields the
+    final response, which may still be a non-retryable error such as 401 or 404. Raises
+    ProviderUnavailable when the provider's circuit is open or retries run out.
+
+    With `refresh` (an async callable taking the rejected access token and returning a new one
+    or None), a 401 refreshes the token once and retries; if that fails the 401 is yielded. The Authorization header in the
+    caller's `headers` dict is replaced in place, so later requests reusing it carry the new token.
+    """
+    breaker = breakers.setdefault(provider, CircuitBreaker())
+    if not breaker.allow():
+        raise ProviderUnavailable(f"{provider} circuit open")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + RETRY_DEADLINE
+    provider_limit, tenant_limit = _limit(provider, tenant)
+    attempt = 0
+    headers = kwargs.get("headers")
+    # The half-open trial must report an outcome; one that dies on anything else frees the slot
+    trial, recorded = breaker.opened_at is not None, False
+    try:
+        while True:
+            resp = None
+            async with provider_limit, tenant_limit:
+                try:
+                    resp = await session.request(method, url, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT), **kwargs)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+
+            if resp is not None and resp.status == 401 and refresh and headers:
+                token, refresh = await refresh(headers.get("Authorization", "").removeprefix("Bearer ")), None
+                if token:
+                    resp.release()
+                    headers["Authorization"] = f"Bearer {token}"
+                    continue
+
+            if resp is not None and resp.status not in RETRY_STATUSES:
+                breaker.record(True)
+                recorded = True
+                try:
+                    yield resp
+                finally:
+                    resp.release()
+                return
+
+            delay = retry_after(resp)
+            if delay is None:
+                delay = backoff(attempt)
+            status = resp.status if resp is not None else "connection error"
+            if resp is not None:
+                resp.release()
+            attempt += 1
+            if loop.time() + delay > deadline:
+                breaker.record(False)
+                recorded = True
+                raise ProviderUnavailable(f"{provider} gave up after {attempt} attempt(s): {status}")
+            await asyncio.sleep(delay)
+    finally:
+        if trial and not recorded:
+            breaker.trial = False
+
+
+_WS = re.compile(r'[ \t\n\r]*')
+
+class JsonArrayStream:
+    """
+    Incremental parser for a JSON object whose bulk is one array under `key` (Google's
+    "items", Graph's "value"). feed() takes text as it arrives and returns the array
+    elements completed so far, so at most one element is held unparsed; the object's
+    other members (page tokens, next/delta links) are collected in `meta`.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.meta = {}
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._member = None
+
+    def feed(self, text, final=False):
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        items = []
+        while self._step(items, final):
+            pass
+        return items
+
+    def close(self):
+        self.feed("", final=True)
+        if self._state != "done":
+            raise ValueError(f"truncated JSON response (stopped in {self._state})")
+
+    def _decode(self, final):
+        """Next JSON value at the cursor, or raises IndexError when it may continue past the buffer."""
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            raise IndexError
+        # A number cut off at the end of the buffer ("12", "-0.", "1e") may have more coming
+        if isinstance(value, (int, float)) and not final and (end == len(self._buf) or self._buf[end] in ".eE+-"):
+            raise IndexError
+        self._pos = end
+        return value
+
+    def _step(self, items, final):
+        self._pos = _WS.match(self._buf, self._pos).end()
+        if self._state == "done" or self._pos >= len(self._buf):
+            return False
+        char = self._buf[self._pos]
+        try:
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError(f"expected a JSON object, got {char!r}")
+                self._pos += 1
+                self._state = "member"
+            elif self._state == "member":
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                elif char == ",":
+                    self._pos += 1
+                else:
+                    self._member = self._decode(final)
+                    self._state = "colon"
+            elif self._state == "colon":
+                if char != ":":
+                    raise ValueError(f"expected ':', got {char!r}")
+                self._pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                if self._member == self.key and char == "[":
+                    self._pos += 1
+                    self._state = "array"
+                else:
+                    self.meta[self._member] = self._decode(final)
+                    self._state = "member"
+            elif self._state == "array":
+                if char == "]":
+                    self._pos += 1
+                    self._state = "member"
+                elif char == ",":
+                    self._pos += 1
+                else:
+                    items.append(self._decode(final))
+        except IndexError:
+            return False
+        return True
+
+async def iter_json_array(resp, parser, stream=True):
+    """
+    Yields the elements of `parser.key` from an aiohttp response body as they arrive
+    (or, with stream=False, after reading the whole body). `parser.meta` is complete
+    once iteration ends.
+    """
+    decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")()
+    chunks = resp.content.iter_chunked(STREAM_CHUNK) if stream else _whole_body(resp)
+    async for chunk in chunks:
+        for item in parser.feed(decoder.decode(chunk)):
+            yield item
+    for item in parser.feed(decoder.decode(b"", final=True)):
+        yield item
+    parser.close()
+
+async def _whole_body(resp):
+    yield await resp.read()
@@ -4,7 +4,9 @@ import datetime as dt
 import time
 import requests
 import email_utils
-from modules.scheduler import calculate_local_pain
+import cache_utils
+from async_calendar_utils import gather_all_conflicts, run_on_provider_loop
+from nync_core import meeting_pain
 
 @st.fragment
 def show(supabase, team_id):
@@ -81,7 +83,7 @@ def show(supabase, team_id):
         st.divider()
 
         st.markdown("#### 🗳️ Active Polls")
-        polls = supabase.table('polls').select('id, status, created_at, poll_options(id, slot_time, pain_score, poll_votes(voter_name))').eq('team_id', team_id).eq('status', 'active').order('created_at', desc=True).execute()
+        polls = supabase.table('polls').select('id, status, created_at, poll_options(id, slot_time, pain_score, duration_minutes, slot_minutes, poll_votes(voter_name))').eq('team_id', team_id).eq('status', 'active').order('created_at', desc=True).execute()
 
         conns = supabase.table('calendar_connections').select('provider').eq('user_id', st.session_state.user.id).execute()
         user_providers = [c['provider'] for c in conns.data] if conns.data else []
@@ -141,15 +143,26 @@ def show(supabase, team_id):
                                 attendees = list(set(team_emails + guest_emails))
 
                                 target_date = slot_dt_utc.date()
-                                hour = slot_dt_utc.hour
+                                # Options proposed before lengths were stored book as 30-minute meetings
+                                duration = winning_opt.get('duration_minutes') or 30
+                                slot_minutes = winning_opt.get('slot_minutes') or (
+                                    60 if slot_dt_utc.minute == 0 else 30 if slot_dt_utc.minute == 30 else 15)
+                                try:
+                                    # Same calendars the search scored; a meeting late in the day can run into the next
+                                    conflicts, _ = cache_utils.get_conflict_cache().get_or_fetch(
+                                        team_id, roster, target_date, 2,
+                                        lambda members, start, span: run_on_provider_loop(gather_all_conflicts(members, start, span))
+                                    )
+                                except Exception as e:
+                                    print(f"[nync] Could not load conflicts for booking: {e}")
+                                    conflicts = {}
+                                pains = meeting_pain(roster, conflicts, slot_dt_utc.replace(tzinfo=None), slot_minutes, duration)
                                 pain_inserts = []
 
-                                for member in roster:
+                                for member, pain in zip(roster, pains):
                                     name = member.get('name', 'Unknown')
                                     email = member.get('email') or name
-                                    tz = member.get('tz', 'UTC')
 
-                                    pain = calculate_local_pain(target_date, hour, tz)
                                     if pain > 0:
                                         pain_inserts.append({
                                             'team_id': team_id,
@@ -157,16 +170,15 @@ def show(supabase, team_id):
                                             'pain_score': pain
                                         })
 
-                                if pain_inserts:
-                                    supabase.table('pain_ledger').insert(pain_inserts).execute()
+                                auth.record_pain(team_id, pain_inserts)
 
                                 booked = False
                                 video_link = None
 
                                 if actual_provider == 'outlook':
-                                    booked, video_link = auth.book_outlook_meeting(st.session_state.user.id, custom_subject, slot_dt_utc, 30, attendees)
+                                    booked, video_link = auth.book_outlook_meeting(st.session_state.user.id, custom_subject, slot_dt_utc, duration, attendees)
                                 elif actual_provider == 'google':
-                                    booked, video_link = auth.book_google_meeting(st.session_state.user.id, custom_subject, slot_dt_utc, 30, attendees)
+                                    booked, video_link = auth.book_google_meeting(st.session_state.user.id, custom_subject, slot_dt_utc, duration, attendees)
 
                                 if booked:
                                     st.toast(f"✅ Meeting Booked via {actual_provider.capitalize()}!")
@@ -1,145 +1,65 @@
 import streamlit as st
 import datetime as dt
-import pytz
 import json
 import pandas as pd
 import altair as alt
 import requests
 import calendar_utils as cal
+import nync_core
+from nync_core import busy_intervals
 import email_utils
 import billing_utils
+import team_utils
+import cache_utils
 import time
-import asyncio
-import nest_asyncio
-from async_calendar_utils import gather_all_conflicts
+from async_calendar_utils import gather_all_conflicts, run_on_provider_loop
 
-nest_asyncio.apply()
+# Cards shown when listing the full trade-off front
+MAX_FRONT_CARDS = 9
 
 
-def calculate_local_pain(target_date, hour, user_tz_str, work_start=9, work_end=17):
-    try:
-        user_tz = pytz.timezone(user_tz_str)
-        utc_time = dt.datetime.combine(target_date, dt.time(hour=hour)).replace(tzinfo=pytz.UTC)
-        local_time = utc_time.astimezone(user_tz)
-        local_hour = local_time.hour
-        is_weekend = local_time.weekday() >= 5
-
-        if work_start <= local_hour < work_end:
-            base_pain = 0
-        elif (work_start - 1) <= local_hour < work_start or work_end <= local_hour < (work_end + 1):
-            base_pain = 1
-        elif (work_start - 2) <= local_hour < (work_start - 1) or (work_end + 1) <= local_hour < (work_end + 3):
-            base_pain = 3
-        elif (work_start - 3) <= local_hour < (work_start - 2) or (work_end + 3) <= local_hour < (work_end + 5):
-            base_pain = 5
-        else:
-            base_pain = 10
-
-        if is_weekend:
-            return min(10, base_pain + 8)
-        return base_pain
-    except:
-        return 0
+def _get_conflicts(roster, target_date, days):
+    # Busy intervals don't depend on the slot size, so one fetch serves every grid
+    team_id = st.session_state.get('active_team_id', 'unknown')
+    conflicts, unreadable = cache_utils.get_conflict_cache().get_or_fetch(
+        team_id, roster, target_date, days,
+        lambda members, start, span: run_on_provider_loop(gather_all_conflicts(members, start, span))
+    )
+    if unreadable:
+        names = [m.get('name', 'Unknown') for m in roster if str(m.get('user_id')) in unreadable]
+        st.warning(f"⚠️ Couldn't read the live calendar of {', '.join(names)}. "
+                   f"Their busy times may be missing, so suggestions could clash with their meetings.")
+    return conflicts
 
 
-def _run_async(coro):
-    try:
-        loop = asyncio.get_event_loop()
-        return loop.run_until_complete(coro)
-    except RuntimeError:
-        return asyncio.run(coro)
+@st.cache_data(ttl=600, show_spinner=False)
+def build_heatmap_dataframe(target_date, roster_json, conflicts_json, slot_minutes=60):
+    rows = nync_core.heatmap_rows(json.loads(roster_json), json.loads(conflicts_json), target_date, slot_minutes)
+    return pd.DataFrame(rows)
 
 
-def _get_conflicts(roster, target_date, days):
-    team_id = st.session_state.get('active_team_id', 'unknown')
-    cache_key = f"conflicts_{team_id}_{target_date}_{days}"
-    if cache_key not in st.session_state:
-        st.session_state[cache_key] = _run_async(
-            gather_all_conflicts(roster, target_date, days)
-        )
-    return st.session_state[cache_key]
+@st.cache_data(ttl=600, show_spinner=False)
+def get_best_slots(roster_json, start_date, days=7, conflicts_json="{}", history_json="{}", slot_minutes=60,
+                   duration_minutes=60):
+    """Cached nync_core.best_slots for the JSON-encoded roster, conflicts and history."""
+    return nync_core.best_slots(json.loads(roster_json), json.loads(conflicts_json), json.loads(history_json),
+                                start_date, days, slot_minutes, duration_minutes)
 
 
 @st.cache_data(ttl=600, show_spinner=False)
-def build_heatmap_dataframe(target_date, roster_json, conflicts_json):
-    roster = json.loads(roster_json)
-    conflicts_dict = json.loads(conflicts_json)
-    data = []
-    for h in range(24):
-        display_time = f"{h:02d}:00 UTC"
-        for member in roster:
-            name = member.get('name', 'Unknown')
-            tz = member.get('tz', 'UTC')
-            w_start = member.get('work_start', 9)
-            w_end = member.get('work_end', 17)
-            uid = str(member.get('user_id', ''))
-            pain = calculate_local_pain(target_date, h, tz, w_start, w_end)
-            slot_str = dt.datetime.combine(target_date, dt.time(hour=h)).isoformat()
-            event_title = "Clear"
-            if uid in conflicts_dict and slot_str in conflicts_dict[uid]:
-                pain += 25
-                event_title = conflicts_dict[uid][slot_str]
-            data.append({
-                "Time": display_time, "Hour": h,
-                "Member": name, "Pain Score": pain, "Local Timezone": tz,
-                "Event": event_title
-            })
-    return pd.DataFrame(data)
+def get_pareto_slots(roster_json, start_date, days=7, conflicts_json="{}", history_json="{}", slot_minutes=60,
+                     duration_minutes=60):
+    """Cached nync_core.trade_off_slots: every slot not beaten on conflicts, fairness and pain at once."""
+    return nync_core.trade_off_slots(json.loads(roster_json), json.loads(conflicts_json), json.loads(history_json),
+                                     start_date, days, slot_minutes, duration_minutes)
 
 
 @st.cache_data(ttl=600, show_spinner=False)
-def get_best_slots(roster_json, start_date, days=7, conflicts_json="{}", history_json="{}"):
-    """
-    Magic Algorithm: Finds the 3 lowest-pain slots weighted by historical karma.
-    Slots are ranked by: no conflicts > smallest lifetime fairness gap > lowest immediate pain.
-    history_json: JSON dict of {email: cumulative_pain_score}
-    """
-    roster = json.loads(roster_json)
-    conflicts_dict = json.loads(conflicts_json)
-    history_map = json.loads(history_json)
-    best_slots = []
-
-    for day_offset in range(days):
-        current_date = start_date + dt.timedelta(days=day_offset)
-        for h in range(24):
-            slot_dt_naive = dt.datetime.combine(current_date, dt.time(hour=h))
-            slot_str = slot_dt_naive.isoformat()
-            total_pain = 0
-            conflict_count = 0
-            lifetime_balances = []
-
-            for m in roster:
-                w_start = m.get('work_start', 9)
-                w_end = m.get('work_end', 17)
-                email = m.get('email', '')
-                pain = calculate_local_pain(current_date, h, m.get('tz', 'UTC'), w_start, w_end)
-                uid = m.get('user_id')
-
-                if uid and str(uid) in conflicts_dict:
-                    if slot_str in conflicts_dict[str(uid)]:
-                        pain += 25
-                        conflict_count += 1
-
-                total_pain += pain
-                # Karma: project what this person's lifetime total would be after this meeting
-                projected = history_map.get(email, 0) + pain
-                lifetime_balances.append(projected)
-
-            # Fairness gap: difference between most and least pained member (lifetime)
-            fairness_gap = (max(lifetime_balances) - min(lifetime_balances)) if lifetime_balances else 0
-
-            best_slots.append({
-                'date': current_date,
-                'hour': h,
-                'time_str': f"{h:02d}:00 UTC",
-                'total_pain': total_pain,
-                'conflicts': conflict_count,
-                'fairness_gap': fairness_gap,
-            })
-
-    # Sort: fewest conflicts first, then fairest (smallest gap), then lowest immediate pain
-    best_slots.sort(key=lambda x: (x['conflicts'] > 0, x['fairness_gap'], x['total_pain']))
-    return best_slots[:3]
+def get_series_plan(roster_json, start_date, weeks, conflicts_json="{}", history_json="{}", slot_minutes=60,
+                    duration_minutes=60):
+    """Cached nync_core.series_plan: one slot per week, spreading the pain across the team."""
+    return nync_core.series_plan(json.loads(roster_json), json.loads(conflicts_json), json.loads(history_json),
+                                 start_date, weeks, slot_minutes, duration_minutes)
 
 
 def notify_team(supabase, team_id, roster, target_date, chosen_time, total_pain):
@@ -181,8 +101,48 @@ def notify_team(supabase, team_id, roster, target_date, chosen_time, total_pain)
         print(f"[nync] notify_team failed: {e}")
 
 
+def _render_slot_card(supabase, team_id, roster, slot, key, slot_minutes=60, duration_minutes=60):
+    with st.container(border=True):
+        st.markdown(f"**{slot['date'].strftime('%a, %b %d')}**")
+        st.markdown(
+            f"<h3 style='margin:0; padding:0; color:#4f46e5;'>{slot['time_str']}</h3>",
+            unsafe_allow_html=True
+        )
+        if slot['conflicts'] > 0:
+            st.error(f"⚠️ {slot['conflicts']} Overlap(s)")
+        else:
+            st.success("✅ Clear Calendars")
+        base_pain = slot['total_pain'] - (slot['conflicts'] * nync_core.CONFLICT_PENALTY)
+        st.caption(f"🔥 Base Pain: **{base_pain}**")
+        gap = slot.get('fairness_gap', 0)
+        if gap == 0:
+            st.caption("⚖️ Fairness: **Perfect**")
+        else:
+            st.caption(f"⚖️ Fairness gap: **{gap}**")
+
+        if st.button("Propose", key=key, use_container_width=True):
+            poll = supabase.table('polls').insert({'team_id': team_id, 'status': 'active'}).execute()
+            if poll.data:
+                poll_id = poll.data[0]['id']
+                slot_dt = dt.datetime.combine(
+                    slot['date'], dt.time(hour=slot['hour'], minute=slot['minute'])
+                ).replace(tzinfo=dt.timezone.utc)
+                supabase.table('poll_options').insert({
+                    'poll_id': poll_id,
+                    'slot_time': slot_dt.isoformat(),
+                    'pain_score': int(base_pain),
+                    'duration_minutes': duration_minutes,
+                    'slot_minutes': slot_minutes
+                }).execute()
+                st.success("✅ Poll Created! Check the Pain Board.")
+                notify_team(supabase, team_id, roster, slot['date'], slot['time_str'], base_pain)
+                st.session_state.show_magic = False
+                time.sleep(0.2)
+                st.rerun()
+
+
 @st.fragment
-def render_magic_suggest(supabase, team_id, roster, target_date, user_id):
+def render_magic_suggest(supabase, team_id, roster, target_date, user_id, slot_minutes=60):
     user_tier = billing_utils.get_user_tier(user_id)
     if user_tier == 'free':
         st.button("✨ Auto-Find Best Times", type="primary", use_container_width=True, disabled=True)
@@ -193,11 +153,13 @@ def render_magic_suggest(supabase, team_id, roster, target_date, user_id):
             st.rerun(scope="fragment")
 
     if st.session_state.get('show_magic', False):
-        st.markdown("#### 🎯 Top 3 Suggested Slots")
+        st.markdown("#### 🎯 Suggested Slots")
 
+        scope_days = {"Selected Date Only": 1, "Next 7 Days": 7, "Next 14 Days": 14, "Next 30 Days": 30,
+                      "Next 90 Days": 90}
         scope = st.segmented_control(
             "Search Scope",
-            options=["Selected Date Only", "Next 7 Days"],
+            options=list(scope_days),
             default="Next 7 Days",
             selection_mode="single",
             label_visibility="collapsed"
@@ -205,72 +167,65 @@ def render_magic_suggest(supabase, team_id, roster, target_date, user_id):
 
         if not scope:
             scope = "Next 7 Days"
-        days_to_scan = 7 if scope == "Next 7 Days" else 1
+        days_to_scan = scope_days[scope]
+        duration = st.select_slider("Meeting Length", options=[15, 30, 45, 60, 90, 120], value=60,
+                                    format_func=lambda m: f"{m} min")
         check_live = st.checkbox("🔄 Avoid Calendar Conflicts (Live Sync)", value=True,
                                  help="Pulls live Google/Outlook data for the whole team.")
+        show_front = st.toggle("⚖️ Show All Trade-offs", value=False,
+                               help="Lists every slot that is not beaten on overlaps, fairness and pain at once, "
+                                    "instead of the top 3.")
 
-        if days_to_scan == 7:
-            st.caption(f"Scanning **168 hours** starting from {target_date.strftime('%b %d')}.")
+        if days_to_scan > 1:
+            st.caption(f"Scanning **{days_to_scan * 24} hours** starting from {target_date.strftime('%b %d')}.")
         else:
             st.caption(f"Scanning all **24 hours on {target_date.strftime('%b %d')}**.")
 
         with st.spinner("Crunching the math & syncing calendars..."):
-            conflicts_dict = {}
+            conflicts = {}
             if check_live:
-                conflicts_dict = _get_conflicts(roster, target_date, days_to_scan)
+                conflicts = _get_conflicts(roster, target_date, days_to_scan)
 
             roster_json = json.dumps(roster, default=str)
-            conflicts_json = json.dumps(conflicts_dict, default=str)
-            # Build history map from pain_ledger for karma-aware suggestions
-            history_map = {}
-            try:
-                ledger = supabase.table('pain_ledger').select('user_email, pain_score').eq('team_id', team_id).execute()
-                for row in ledger.data:
-                    e = row['user_email']
-                    history_map[e] = history_map.get(e, 0) + row['pain_score']
-            except Exception:
-                pass
-            history_json = json.dumps(history_map, default=str)
-            top_slots = get_best_slots(roster_json, target_date, days_to_scan, conflicts_json, history_json)
-            cols = st.columns(3)
-
-            for i, slot in enumerate(top_slots):
-                with cols[i]:
-                    with st.container(border=True):
-                        st.markdown(f"**{slot['date'].strftime('%a, %b %d')}**")
-                        st.markdown(
-                            f"<h3 style='margin:0; padding:0; color:#4f46e5;'>{slot['time_str']}</h3>",
-                            unsafe_allow_html=True
-                        )
-                        if slot['conflicts'] > 0:
-                            st.error(f"⚠️ {slot['conflicts']} Overlap(s)")
-                        else:
-                            st.success("✅ Clear Calendars")
-                        base_pain = slot['total_pain'] - (slot['conflicts'] * 25)
-                        st.caption(f"🔥 Base Pain: **{base_pain}**")
-                        gap = slot.get('fairness_gap', 0)
-                        if gap == 0:
-                            st.caption("⚖️ Fairness: **Perfect**")
-                        else:
-                            st.caption(f"⚖️ Fairness gap: **{gap}**")
-
-                        if st.button("Propose", key=f"mag_prop_{i}_{days_to_scan}", use_container_width=True):
-                            poll = supabase.table('polls').insert({'team_id': team_id, 'status': 'active'}).execute()
-                            if poll.data:
-                                poll_id = poll.data[0]['id']
-                                slot_dt = dt.datetime.combine(
-                                    slot['date'], dt.time(hour=slot['hour'])
-                                ).replace(tzinfo=dt.timezone.utc)
-                                supabase.table('poll_options').insert({
-                                    'poll_id': poll_id,
-                                    'slot_time': slot_dt.isoformat(),
-                                    'pain_score': int(base_pain)
-                                }).execute()
-                                st.success("✅ Poll Created! Check the Pain Board.")
-                                notify_team(supabase, team_id, roster, slot['date'], slot['time_str'], base_pain)
-                                st.session_state.show_magic = False
-                                time.sleep(0.2)
-                                st.rerun()
+            conflicts_json = json.dumps(busy_intervals.dumps(conflicts))
+            # Lifetime pain per member for karma-aware suggestions
+            history_json = json.dumps(team_utils.get_pain_totals(team_id), default=str)
+            if show_front:
+                top_slots = get_pareto_slots(roster_json, target_date, days_to_scan, conflicts_json, history_json,
+                                             slot_minutes, duration)
+                st.caption(f"**{len(top_slots)}** slot(s) where no other time is better on overlaps, "
+                           f"fairness and pain all at once.")
+            else:
+                top_slots = get_best_slots(roster_json, target_date, days_to_scan, conflicts_json, history_json,
+                                           slot_minutes, duration)
+
+            for row_start in range(0, min(len(top_slots), MAX_FRONT_CARDS), 3):
+                cols = st.columns(3)
+                for i, slot in enumerate(top_slots[row_start:row_start + 3], start=row_start):
+                    with cols[i - row_start]:
+                        _render_slot_card(supabase, team_id, roster, slot, f"mag_prop_{i}_{days_to_scan}",
+                                          slot_minutes, duration)
+
+        with st.expander("🔁 Plan a Weekly Series"):
+            weeks = st.number_input("Occurrences (weeks)", min_value=2, max_value=12, value=4, step=1)
+            st.caption("Picks one slot per week so the same people don't take the hit every time, "
+                       "using everyone's pain history.")
+            if st.button("Plan Rotation", key="plan_series", use_container_width=True):
+                with st.spinner("Rotating the pain..."):
+                    series_conflicts = _get_conflicts(roster, target_date, 7 * weeks) if check_live else {}
+                    plan, member_pain = get_series_plan(
+                        roster_json, target_date, weeks, json.dumps(busy_intervals.dumps(series_conflicts)), history_json,
+                        slot_minutes, duration
+                    )
+                st.dataframe(pd.DataFrame([{
+                    "Week": n + 1, "Date": slot['date'].strftime('%a, %b %d'), "Time": slot['time_str'],
+                    "Base Pain": slot['total_pain'] - slot['conflicts'] * nync_core.CONFLICT_PENALTY,
+                    "Overlaps": slot['conflicts'],
+                } for n, slot in enumerate(plan)]), hide_index=True, use_container_width=True)
+                st.caption("Pain each member takes over the series:")
+                st.dataframe(pd.DataFrame({
+                    "Member": [m.get('name', 'Unknown') for m in roster], "Series Pain": member_pain
+                }).sort_values("Series Pain", ascending=False), hide_index=True, use_container_width=True)
         st.divider()
 
 
@@ -287,22 +242,30 @@ def show(supabase, user, roster):
     c_mag, c_date, c_sync = st.columns([1, 2, 1], vertical_alignment="bottom")
     with c_date:
         target_date = st.date_input("Select Target Date", dt.date.today() + dt.timedelta(days=1))
+        slot_minutes = st.segmented_control(
+            "Slot Size",
+            options=nync_core.SLOT_MINUTES,
+            default=60,
+            format_func=lambda m: f"{m} min",
+            selection_mode="single",
+            key="slot_minutes"
+        ) or 60
     with c_mag:
-        render_magic_suggest(supabase, team_id, roster, target_date, user.id)
+        render_magic_suggest(supabase, team_id, roster, target_date, user.id, slot_minutes)
     with c_sync:
         if st.button("🔄 Sync Live Calendars", use_container_width=True):
             build_heatmap_dataframe.clear()
             get_best_slots.clear()
-            keys_to_del = [k for k in st.session_state if k.startswith(f"conflicts_{team_id}")]
-            for k in keys_to_del:
-                del st.session_state[k]
+            get_pareto_slots.clear()
+            get_series_plan.clear()
+            cache_utils.get_conflict_cache().invalidate(team_id)
             st.rerun()
 
     with st.spinner("Loading Availability..."):
-        conflicts_dict = _get_conflicts(roster, target_date, 1)
+        conflicts = _get_conflicts(roster, target_date, 1)
         roster_json = json.dumps(roster, default=str)
-        conflicts_json = json.dumps(conflicts_dict, default=str)
-        df = build_heatmap_dataframe(target_date, roster_json, conflicts_json)
+        conflicts_json = json.dumps(busy_intervals.dumps(conflicts))
+        df = build_heatmap_dataframe(target_date, roster_json, conflicts_json, slot_minutes)
 
         time_sel = alt.selection_point(fields=['Time'], name="TimeSelect")
         heatmap = alt.Chart(df).mark_rect(cornerRadius=6).encode(
@@ -322,7 +285,7 @@ def show(supabase, user, roster):
             ]
         ).add_params(time_sel).properties(
             height=120 + (len(roster) * 45),
-            width=1000
+            width=1000 * 60 // slot_minutes
         ).configure_axis(
             labelFontSize=13, titleFontSize=14, grid=False, domain=False, tickSize=0
         ).configure_view(strokeWidth=0)
@@ -339,6 +302,7 @@ def show(supabase, user, roster):
                     time_df = df[df["Time"] == chosen_time]
                     total_pain = time_df["Pain Score"].sum()
                     chosen_hour = time_df["Hour"].iloc[0]
+                    chosen_minute = time_df["Minute"].iloc[0]
 
                     st.markdown("---")
                     c1, c2 = st.columns([2, 1])
@@ -354,12 +318,14 @@ def show(supabase, user, roster):
                                 if poll.data:
                                     poll_id = poll.data[0]['id']
                                     slot_dt = dt.datetime.combine(
-                                        target_date, dt.time(hour=chosen_hour)
+                                        target_date, dt.time(hour=int(chosen_hour), minute=int(chosen_minute))
                                     ).replace(tzinfo=dt.timezone.utc)
                                     supabase.table('poll_options').insert({
                                         'poll_id': poll_id,
                                         'slot_time': slot_dt.isoformat(),
-                                        'pain_score': int(total_pain)
+                                        'pain_score': int(total_pain),
+                                        'duration_minutes': slot_minutes,
+                                        'slot_minutes': slot_minutes
                                     }).execute()
                                     st.success(f"Poll created for {chosen_time}! Check the Pain Board.")
                                     notify_team(supabase, team_id, roster, target_date, chosen_time, total_pain)
@@ -0,0 +1,16 @@
+"""
+Nync scheduling core: pain scoring and slot search on plain data.
+
+Inputs are the roster dicts from team_utils.get_team_roster, a conflicts map
+of {user_id: BusyIntervals} (or its JSON form, {user_id: [[start, end, title]]}
+in epoch minutes or ISO strings) and an {email: pain} history map.
+Nothing here imports Streamlit, so cron jobs, the batch CLI
+(`python -m nync_core`) and benchmarks can use it directly.
+"""
+from nync_core.busy_intervals import BusyIntervals
+from nync_core.pain_engine import (
+    CONFLICT_PENALTY, SLOT_MINUTES, calculate_local_pain, heatmap_rows, meeting_pain, pain_matrix, pain_table,
+    slot_label, slots_per_day, window_pain,
+)
+from nync_core.slot_search import best_slots, describe_slots, pareto_slots, top_k_slots, trade_off_slots
+from nync_core.series_planner import plan_rotation, series_plan
@@ -0,0 +1,60 @@
+"""
+Batch precompute CLI for the scheduling core.
+
+    python -m nync_core best roster.json --start 2026-11-02 --days 30
+    python -m nync_core front roster.json --conflicts conflicts.json --history history.json
+    python -m nync_core series roster.json --weeks 12 --duration 90
+
+Prints the result as JSON on stdout.
+"""
+import argparse
+import datetime as dt
+import json
+import sys
+
+import nync_core
+
+
+def _load(path, default):
+    if not path:
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nync_core", description="Nync slot search without the UI.")
+    parser.add_argument("mode", choices=["best", "front", "series"])
+    parser.add_argument("roster", help="JSON list of roster members")
+    parser.add_argument("--conflicts", help="JSON {user_id: [[start_iso, end_iso, title], ...]}")
+    parser.add_argument("--history", help="JSON {email: lifetime_pain}")
+    parser.add_argument("--start", type=dt.date.fromisoformat, default=dt.date.today() + dt.timedelta(days=1))
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--slot", type=int, choices=nync_core.SLOT_MINUTES, default=60)
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    roster = _load(args.roster, [])
+    conflicts = _load(args.conflicts, {})
+    history = _load(args.history, {})
+
+    if args.mode == "best":
+        result = nync_core.best_slots(roster, conflicts, history, args.start, args.days, args.slot, args.duration,
+                                      args.k)
+    elif args.mode == "front":
+        result = nync_core.trade_off_slots(roster, conflicts, history, args.start, args.days, args.slot,
+                                           args.duration)
+    else:
+        slots, member_pain = nync_core.series_plan(roster, conflicts, history, args.start, args.weeks, args.slot,
+                                                   args.duration)
+        result = {"occurrences": slots,
+                  "member_pain": {m.get('email') or m.get('name'): p for m, p in zip(roster, member_pain)}}
+
+    json.dump(result, sys.stdout, default=str, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import bisect
+import datetime as dt
+import sys
+import numpy as np
+from nync_core import tz_offsets
+
+
+def to_minutes(value):
+    """Epoch minutes from epoch minutes, a naive UTC datetime or an ISO string."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo:
+        value = value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return tz_offsets.to_epoch_minutes(value)
+
+
+class BusyIntervals:
+    """
+    One member's calendar as sorted, non-overlapping [start, end) intervals in
+    epoch minutes, each with an interned title. Overlapping events are merged
+    on insert (the earlier event's title wins); back-to-back events stay separate
+    so each keeps its own title. A multi-day event is a single entry.
+    """
+    __slots__ = ('starts', 'ends', 'titles', '_arrays')
+
+    def __init__(self, intervals=()):
+        self.starts, self.ends, self.titles = [], [], []
+        self._arrays = None
+        for start, end, title in intervals:
+            self.add(start, end, title)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends, self.titles))
+
+    def __eq__(self, other):
+        return isinstance(other, BusyIntervals) and list(self) == list(other)
+
+    def add(self, start, end, title="Busy"):
+        start, end = to_minutes(start), to_minutes(end)
+        if end <= start:
+            return
+        title = sys.intern(title or "Busy")
+        self._arrays = None
+        if not self.starts or start >= self.ends[-1]:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.titles.append(title)
+            return
+
+        i = bisect.bisect_right(self.starts, start)
+        if i > 0 and self.ends[i - 1] > start:
+            i -= 1
+            start, title = self.starts[i], self.titles[i]
+        j = i
+        while j < len(self.starts) and self.starts[j] < end:
+            end = max(end, self.ends[j])
+            if self.starts[j] < start:
+                start, title = self.starts[j], self.titles[j]
+            j += 1
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+        self.titles[i:j] = [title]
+
+    def update(self, other):
+        for start, end, title in other:
+            self.add(start, end, title)
+        return self
+
+    def remove(self, start, end):
+        """Frees [start, end), trimming or splitting any interval that covers part of it."""
+        start, end = to_minutes(start), to_minutes(end)
+        kept = []
+        for s, e, title in self:
+            if e <= start or s >= end:
+                kept.append((s, e, title))
+                continue
+            if s < start:
+                kept.append((s, start, title))
+            if e > end:
+                kept.append((end, e, title))
+        self.starts = [k[0] for k in kept]
+        self.ends = [k[1] for k in kept]
+        self.titles = [k[2] for k in kept]
+        self._arrays = None
+
+    def _first_overlap(self, start, end):
+        # Intervals are disjoint and sorted, so ends are sorted too
+        i = bisect.bisect_right(self.ends, start)
+        if i < len(self.starts) and self.starts[i] < end:
+            return i
+        return None
+
+    def overlaps(self, start, end):
+        return self._first_overlap(to_minutes(start), to_minutes(end)) is not None
+
+    def title_in(self, start, end):
+        """Title of the first event overlapping [start, end), or None when free."""
+        i = self._first_overlap(to_minutes(start), to_minutes(end))
+        return None if i is None else self.titles[i]
+
+    def clip(self, start, end):
+        """New BusyIntervals holding only the parts of each event inside [start, end)."""
+        start, end = to_minutes(start), to_minutes(end)
+        out = BusyIntervals()
+        i = bisect.bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            out.starts.append(max(self.starts[i], start))
+            out.ends.append(min(self.ends[i], end))
+            out.titles.append(self.titles[i])
+            i += 1
+        return out
+
+    def slot_mask(self, start, n_slots, slot_minutes=60):
+        """Bool array, True for every slot of the grid starting at `start` that overlaps an event."""
+        start = to_minutes(start)
+        mask = np.zeros(n_slots, dtype=bool)
+        if not self.starts:
+            return mask
+        if self._arrays is None:
+            self._arrays = (np.array(self.starts, dtype=np.int64), np.array(self.ends, dtype=np.int64))
+        starts, ends = self._arrays
+        end = start + n_slots * slot_minutes
+        lo = np.searchsorted(ends, start, side='right')
+        hi = np.searchsorted(starts, end, side='left')
+        first = (np.maximum(starts[lo:hi], start) - start) // slot_minutes
+        last = -(-(np.minimum(ends[lo:hi], end) - start) // slot_minutes)
+        # Mark run boundaries and fill with a running sum
+        edges = np.zeros(n_slots + 1, dtype=np.int64)
+        np.add.at(edges, first, 1)
+        np.add.at(edges, last, -1)
+        mask[:] = np.cumsum(edges[:-1]) > 0
+        return mask
+
+    def to_json(self):
+        return [[s, e, t] for s, e, t in self]
+
+    @classmethod
+    def coerce(cls, value):
+        """BusyIntervals from itself or its JSON form ([[start, end, title], ...]); None stays None."""
+        if value is None or isinstance(value, cls):
+            return value
+        return cls(value)
+
+
+def dumps(conflicts):
+    """JSON-ready {user_id: [[start, end, title], ...]} for a conflicts map."""
+    return {uid: BusyIntervals.coerce(busy).to_json() for uid, busy in conflicts.items()}
@@ -0,0 +1,226 @@
+import datetime as dt
+import functools
+import numbers
+import numpy as np
+from nync_core import tz_offsets
+from nync_core.busy_intervals import BusyIntervals
+
+CONFLICT_PENALTY = 25
+SLOT_MINUTES = (60, 30, 15)
+# 1970-01-05, the first Monday after the epoch, in epoch minutes
+MONDAY_MINUTES = 4 * 1440
+
+
+@functools.lru_cache(maxsize=256)
+def pain_table(work_start=9, work_end=17):
+    """
+    Read-only 2 x 24 table of pain indexed by [is_weekend, local_hour] for one
+    work-hour profile. Cached process-wide, so members sharing a profile share a table.
+    """
+    h = np.arange(24)
+    ws, we = work_start, work_end
+    base = np.select(
+        [
+            (ws <= h) & (h < we),
+            ((ws - 1 <= h) & (h < ws)) | ((we <= h) & (h < we + 1)),
+            ((ws - 2 <= h) & (h < ws - 1)) | ((we + 1 <= h) & (h < we + 3)),
+            ((ws - 3 <= h) & (h < ws - 2)) | ((we + 3 <= h) & (h < we + 5)),
+        ],
+        [0, 1, 3, 5],
+        default=10,
+    )
+    table = np.stack([base, np.minimum(10, base + 8)])
+    table.flags.writeable = False
+    return table
+
+
+def calculate_local_pain(target_date, hour, user_tz_str, work_start=9, work_end=17, minute=0):
+    """Pain for one member at one UTC slot; the scalar counterpart of pain_matrix."""
+    try:
+        utc_time = dt.datetime.combine(target_date, dt.time(hour=hour, minute=minute))
+        local_time = tz_offsets.to_local(utc_time, user_tz_str)
+        is_weekend = local_time.weekday() >= 5
+        return int(pain_table(work_start, work_end)[int(is_weekend), local_time.hour])
+    except Exception:
+        return 0
+
+
+def roster_fingerprint(roster):
+    """
+    Distinct (tz, work_start, work_end) rows of a roster and each member's row in
+    that list (-1 for unusable work hours). Members sharing a row score identically.
+    """
+    rows = {}
+    index = np.full(len(roster), -1, dtype=np.int64)
+    for i, m in enumerate(roster):
+        w_start, w_end = m.get('work_start', 9), m.get('work_end', 17)
+        if isinstance(w_start, numbers.Real) and isinstance(w_end, numbers.Real):
+            index[i] = rows.setdefault((m.get('tz', 'UTC'), w_start, w_end), len(rows))
+    return list(rows), index
+
+
+@functools.lru_cache(maxsize=128)
+def _week_template(profiles, offsets, slot_minutes):
+    """
+    Read-only rows x week-slots pain for fixed per-row UTC offsets, one column per
+    slot of a UTC week starting Monday 00:00. Pain only depends on local hour and
+    weekday, so any week with the same offsets is a gather from this template.
+    """
+    per_week = 7 * slots_per_day(slot_minutes)
+    utc = MONDAY_MINUTES + slot_minutes * np.arange(per_week, dtype=np.int64)
+    local = utc[None, :] + np.array(offsets, dtype=np.int64)[:, None]
+    local_hour = (local // 60) % 24
+    # 1970-01-01 was a Thursday (weekday 3)
+    is_weekend = (((local // 1440) + 3) % 7 >= 5).astype(np.int64)
+    tables = np.stack([pain_table(*p) for p in profiles])
+    template = tables[np.arange(len(profiles))[:, None], is_weekend, local_hour]
+    template.flags.writeable = False
+    return template
+
+
+def slots_per_day(slot_minutes=60):
+    return 1440 // slot_minutes
+
+
+def utc_slots(start_date, days, slot_minutes=60):
+    """Minutes since epoch for every UTC slot start in [start_date, start_date + days)."""
+    start = tz_offsets.to_epoch_minutes(dt.datetime.combine(start_date, dt.time.min))
+    return start + slot_minutes * np.arange(days * slots_per_day(slot_minutes), dtype=np.int64)
+
+
+def slot_label(slot_minutes, slot_idx):
+    h, m = divmod((slot_idx % slots_per_day(slot_minutes)) * slot_minutes, 60)
+    return f"{h:02d}:{m:02d} UTC"
+
+
+def pain_matrix(roster, start_date, days=1, slot_minutes=60):
+    """
+    members x slots matrix of base pain for every UTC slot starting at start_date.
+    Scores match calculate_local_pain cell for cell, including the weekend cap.
+
+    Work is done once per distinct (tz, work hours) row and once per week: the
+    horizon is split wherever some zone's offset changes (DST), and each stretch
+    is gathered from the cached week template for its offsets. A 90-day scan
+    costs about as much as a 7-day one.
+    """
+    utc_minutes = utc_slots(start_date, days, slot_minutes)
+    pain = np.zeros((len(roster), len(utc_minutes)), dtype=np.int64)
+    if not roster:
+        return pain
+
+    keys, member_row = roster_fingerprint(roster)
+    offsets, usable = [], np.zeros(len(keys), dtype=bool)
+    for r, (tz, _, _) in enumerate(keys):
+        try:
+            offsets.append(tz_offsets.slot_offsets(tz, start_date, days, slot_minutes))
+            usable[r] = True
+        except Exception:
+            offsets.append(np.zeros(len(utc_minutes), dtype=np.int64))
+    if not usable.any():
+        return pain
+    offsets = np.stack(offsets)
+
+    per_week = 7 * slots_per_day(slot_minutes)
+    week_slot = ((utc_minutes - MONDAY_MINUTES) // slot_minutes) % per_week
+    changes = np.flatnonzero((offsets[:, 1:] != offsets[:, :-1]).any(axis=0)) + 1
+    bounds = [0, *changes.tolist(), len(utc_minutes)]
+    profiles = tuple((w_start, w_end) for _, w_start, w_end in keys)
+    row_pain = np.empty((len(keys), len(utc_minutes)), dtype=np.int64)
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        template = _week_template(profiles, tuple(offsets[:, a].tolist()), slot_minutes)
+        row_pain[:, a:b] = template[:, week_slot[a:b]]
+
+    valid = member_row >= 0
+    valid[valid] = usable[member_row[valid]]
+    pain[valid] = row_pain[member_row[valid]]
+    return pain
+
+
+def busy_matrix(roster, conflicts, start_date, days=1, slot_minutes=60):
+    """
+    Bool members x slots matrix, True where a slot overlaps one of the member's
+    events, from a {user_id: BusyIntervals} conflicts map.
+    """
+    n_slots = days * slots_per_day(slot_minutes)
+    busy = np.zeros((len(roster), n_slots), dtype=bool)
+    if not conflicts:
+        return busy
+    start = tz_offsets.to_epoch_minutes(dt.datetime.combine(start_date, dt.time.min))
+    for i, calendar in enumerate(member_busy(roster, conflicts)):
+        if calendar:
+            busy[i] = calendar.slot_mask(start, n_slots, slot_minutes)
+    return busy
+
+
+def member_busy(roster, conflicts):
+    """Each member's BusyIntervals (None when not connected), in roster order."""
+    out = []
+    for m in roster:
+        uid = m.get('user_id')
+        out.append(BusyIntervals.coerce(conflicts.get(str(uid))) if uid and conflicts else None)
+    return out
+
+
+def coerce_conflicts(conflicts):
+    """Parses a JSON-form conflicts map once so repeated scans reuse the intervals."""
+    return {str(uid): BusyIntervals.coerce(busy) for uid, busy in (conflicts or {}).items()}
+
+
+def window_sums(matrix, width):
+    """Sum over every run of `width` consecutive slots along axis 1, from one cumulative sum."""
+    cs = np.zeros((matrix.shape[0], matrix.shape[1] + 1), dtype=np.int64)
+    np.cumsum(matrix, axis=1, out=cs[:, 1:])
+    return cs[:, width:] - cs[:, :-width]
+
+
+def window_pain(roster, conflicts, start_date, days=1, slot_minutes=60, duration_minutes=60):
+    """
+    Scores a meeting of duration_minutes starting at every slot of the horizon.
+    Returns (pain, busy) as members x starts matrices: a member's pain is their
+    average slot pain over the meeting rounded up, plus the conflict penalty if
+    any slot of the meeting clashes with their calendar.
+    """
+    width = max(1, -(-duration_minutes // slot_minutes))
+    n_starts = days * slots_per_day(slot_minutes)
+    # Meetings that start late on the last day run into the next one
+    pad_days = days + (1 if width > 1 else 0)
+    n_slots = n_starts + width - 1
+    base = pain_matrix(roster, start_date, pad_days, slot_minutes)[:, :n_slots]
+    clashes = busy_matrix(roster, conflicts, start_date, pad_days, slot_minutes)[:, :n_slots]
+
+    pain = -(-window_sums(base, width) // width)
+    busy = window_sums(clashes, width) > 0
+    return pain + busy * CONFLICT_PENALTY, busy
+
+
+def meeting_pain(roster, conflicts, start_dt, slot_minutes=60, duration_minutes=60):
+    """Each member's window_pain for one meeting starting at the naive UTC start_dt, in roster order."""
+    pain, _ = window_pain(roster, coerce_conflicts(conflicts), start_dt.date(), 1, slot_minutes, duration_minutes)
+    return [int(p) for p in pain[:, (start_dt.hour * 60 + start_dt.minute) // slot_minutes]]
+
+
+def heatmap_rows(roster, conflicts, target_date, slot_minutes=60):
+    """One row per (slot, member) for the availability heatmap, pain including conflicts."""
+    n_slots = slots_per_day(slot_minutes)
+    conflicts = coerce_conflicts(conflicts)
+    pain = pain_matrix(roster, target_date, 1, slot_minutes)
+    busy = busy_matrix(roster, conflicts, target_date, 1, slot_minutes)
+    pain = pain + busy * CONFLICT_PENALTY
+    calendars = member_busy(roster, conflicts)
+    day_start = tz_offsets.to_epoch_minutes(dt.datetime.combine(target_date, dt.time.min))
+    rows = []
+    for s in range(n_slots):
+        slot_start = day_start + s * slot_minutes
+        hour, minute = divmod(s * slot_minutes, 60)
+        display_time = slot_label(slot_minutes, s)
+        for i, member in enumerate(roster):
+            event_title = "Clear"
+            if busy[i, s]:
+                event_title = calendars[i].title_in(slot_start, slot_start + slot_minutes)
+            rows.append({
+                "Time": display_time, "Hour": hour, "Minute": minute,
+                "Member": member.get('name', 'Unknown'), "Pain Score": int(pain[i, s]),
+                "Local Timezone": member.get('tz', 'UTC'),
+                "Event": event_title
+            })
+    return rows
@@ -0,0 +1,71 @@
+import datetime as dt
+import numpy as np
+from nync_core import pain_engine
+from nync_core.slot_search import describe_slots
+
+# Partial rotations kept alive after each week. Wider beams trade speed for
+# plans closer to the exhaustive optimum; 8 is plenty for teams of 100.
+BEAM_WIDTH = 8
+
+
+def plan_rotation(roster, conflicts, history_map, start_date, occurrences, slot_minutes=60,
+                  duration_minutes=60, period_days=7, beam_width=BEAM_WIDTH):
+    """
+    Picks one window per period (weekly by default) for a recurring meeting so the
+    burden rotates around the team. Plans are ranked by total overlaps, then the
+    highest lifetime pain any member ends the series with (ledger history
+    included), then the series' total pain.
+
+    Beam search over the running per-member totals: each period every surviving
+    plan is extended by every window of that period in one array operation, and
+    only the best beam_width extensions carry on, so cost grows linearly with the
+    number of occurrences instead of combinatorially.
+
+    Returns {'occurrences': [(index, total_pain, conflicts)], 'member_pain': [...]},
+    where index counts slots from start_date and member_pain is each member's pain
+    over the series in roster order.
+    """
+    if not roster or occurrences <= 0:
+        return {'occurrences': [], 'member_pain': []}
+
+    conflicts = pain_engine.coerce_conflicts(conflicts)
+    history = np.array([history_map.get(m.get('email', ''), 0) for m in roster])
+    per_period = period_days * pain_engine.slots_per_day(slot_minutes)
+    # Each beam entry: (series pain per member, overlaps so far, chosen window indices)
+    beam = [(np.zeros(len(roster), dtype=np.int64), 0, [])]
+
+    for n in range(occurrences):
+        period_start = start_date + dt.timedelta(days=n * period_days)
+        pain, busy = pain_engine.window_pain(roster, conflicts, period_start, period_days,
+                                             slot_minutes, duration_minutes)
+        window_conflicts = busy.sum(axis=0)
+
+        series = np.stack([b[0] for b in beam])[:, :, None] + pain[None, :, :]
+        overlaps = np.array([b[1] for b in beam])[:, None] + window_conflicts[None, :]
+        worst = (history[None, :, None] + series).max(axis=1)
+        total = series.sum(axis=1)
+
+        # Rank every (plan, window) pair; lexsort is stable so earlier windows win ties
+        flat = np.lexsort((total.ravel(), worst.ravel(), overlaps.ravel()))
+        next_beam, seen = [], set()
+        for f in flat:
+            b, w = divmod(int(f), pain.shape[1])
+            signature = tuple(series[b, :, w])
+            if signature in seen:
+                continue
+            seen.add(signature)
+            next_beam.append((series[b, :, w], int(overlaps[b, w]),
+                              beam[b][2] + [(n * per_period + w, int(pain[:, w].sum()), int(window_conflicts[w]))]))
+            if len(next_beam) == beam_width:
+                break
+        beam = next_beam
+
+    series_pain, _, picks = beam[0]
+    return {'occurrences': picks, 'member_pain': [int(p) for p in series_pain]}
+
+
+def series_plan(roster, conflicts, history_map, start_date, weeks, slot_minutes=60, duration_minutes=60):
+    """Weekly rotation as (slot dicts, per-member series pain), ready to display."""
+    plan = plan_rotation(roster, conflicts, history_map, start_date, weeks, slot_minutes, duration_minutes)
+    ranked = [(idx, total_pain, conflicts, 0) for idx, total_pain, conflicts in plan['occurrences']]
+    return describe_slots(ranked, start_date, slot_minutes, duration_minutes), plan['member_pain']
@@ -0,0 +1,170 @@
+import datetime as dt
+import heapq
+import numpy as np
+from nync_core import pain_engine
+
+# Long horizons are scored a week at a time so memory stays at one chunk of
+# members x slots no matter how far ahead we look.
+CHUNK_DAYS = 7
+
+
+def iter_window_scores(roster, conflicts, history_map, start_date, days, slot_minutes=60,
+                       duration_minutes=60, chunk_days=CHUNK_DAYS):
+    """
+    Yields (first_index, pain, busy, lifetime) per chunk of the horizon, where
+    pain/busy are members x window-start matrices from pain_engine.window_pain
+    and lifetime is history + pain. first_index is the chunk's offset in slots.
+    """
+    conflicts = pain_engine.coerce_conflicts(conflicts)
+    history = np.array([history_map.get(m.get('email', ''), 0) for m in roster])
+    per_day = pain_engine.slots_per_day(slot_minutes)
+    for day_offset in range(0, days, chunk_days):
+        chunk_start = start_date + dt.timedelta(days=day_offset)
+        chunk_len = min(chunk_days, days - day_offset)
+        pain, busy = pain_engine.window_pain(roster, conflicts, chunk_start, chunk_len,
+                                             slot_minutes, duration_minutes)
+        yield day_offset * per_day, pain, busy, history[:, None] + pain
+
+
+def top_k_slots(roster, conflicts, history_map, start_date, days=7, slot_minutes=60,
+                duration_minutes=60, k=3):
+    """
+    The k best window starts ranked by (has conflicts, fairness gap, total pain),
+    earliest first on ties. Returns a list of (index, total_pain, conflicts, gap).
+
+    Only k candidates are ever held. Each chunk is pruned against the current
+    k-th best in stages, so slots that already lose on conflicts never get a
+    fairness gap computed, and slots that lose on the gap never get a total.
+    """
+    if not roster or k <= 0:
+        return []
+    # Max-heap of the k best so far via negated keys: heap[0] is the current k-th best
+    heap = []
+    for first, pain, busy, lifetime in iter_window_scores(roster, conflicts, history_map, start_date,
+                                                          days, slot_minutes, duration_minutes):
+        conflicts = busy.sum(axis=0)
+        cand = np.arange(pain.shape[1])
+        if len(heap) == k:
+            worst_flag, worst_gap = -heap[0][0], -heap[0][1]
+            cand = cand[(conflicts[cand] > 0) <= worst_flag]
+        if not len(cand):
+            continue
+
+        sub = lifetime[:, cand]
+        gap = sub.max(axis=0) - sub.min(axis=0)
+        if len(heap) == k:
+            keep = ((conflicts[cand] > 0) < worst_flag) | (gap <= worst_gap)
+            cand, gap = cand[keep], gap[keep]
+            if not len(cand):
+                continue
+
+        total = pain[:, cand].sum(axis=0)
+        flag = conflicts[cand] > 0
+        for j in np.lexsort((total, gap, flag))[:k]:
+            idx = first + int(cand[j])
+            item = (-int(flag[j]), -gap[j].item(), -int(total[j]), -idx, int(conflicts[cand[j]]))
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            else:
+                break
+
+    ranked = sorted(heap, reverse=True)
+    return [(-idx, -total, n_conflicts, -gap) for _, gap, total, idx, n_conflicts in ranked]
+
+
+def pareto_front(conflicts, gap, total):
+    """
+    Positions of the non-dominated points when minimising (conflicts, gap, total),
+    ordered by those keys. Points with identical scores are reported once, at their
+    earliest position.
+
+    Skyline sweep: after sorting by conflicts then gap, a point is dominated exactly
+    when an earlier front point with gap <= its gap has total <= its total, which a
+    Fenwick tree of prefix-minimum totals over gap ranks answers in O(log n).
+    """
+    order = np.lexsort((total, gap, conflicts))
+    gap_rank = np.unique(gap, return_inverse=True)[1] + 1
+    tree = [float('inf')] * (int(gap_rank.max(initial=0)) + 1)
+    front = []
+    prev = None
+    for i in order:
+        key = (conflicts[i], gap[i], total[i])
+        if key == prev:
+            continue
+        prev = key
+        best, r = float('inf'), int(gap_rank[i])
+        while r > 0:
+            best = min(best, tree[r])
+            r -= r & -r
+        if best <= total[i]:
+            continue
+        front.append(int(i))
+        r = int(gap_rank[i])
+        while r < len(tree):
+            tree[r] = min(tree[r], total[i])
+            r += r & -r
+    return front
+
+
+def pareto_slots(roster, conflicts, history_map, start_date, days=7, slot_minutes=60, duration_minutes=60):
+    """
+    Every window on the (conflict count, fairness gap, total pain) trade-off front
+    over the whole horizon, as (index, total_pain, conflicts, gap) tuples ordered by
+    conflicts, then gap, then pain. Each chunk is reduced to its own front first,
+    so only a handful of candidates per week reach the final sweep.
+    """
+    if not roster:
+        return []
+    idx, clashes, gap, total = [], [], [], []
+    for first, pain, busy, lifetime in iter_window_scores(roster, conflicts, history_map, start_date,
+                                                          days, slot_minutes, duration_minutes):
+        c = busy.sum(axis=0)
+        g = lifetime.max(axis=0) - lifetime.min(axis=0)
+        t = pain.sum(axis=0)
+        local = pareto_front(c, g, t)
+        idx.append(first + np.asarray(local, dtype=np.int64))
+        clashes.append(c[local])
+        gap.append(g[local])
+        total.append(t[local])
+
+    idx, clashes = np.concatenate(idx), np.concatenate(clashes)
+    gap, total = np.concatenate(gap), np.concatenate(total)
+    return [(int(idx[j]), int(total[j]), int(clashes[j]), gap[j].item())
+            for j in pareto_front(clashes, gap, total)]
+
+
+def describe_slots(ranked, start_date, slot_minutes=60, duration_minutes=60):
+    """Turns (index, total_pain, conflicts, gap) tuples into the slot dicts the UI and CLI show."""
+    start_dt = dt.datetime.combine(start_date, dt.time.min)
+    slots = []
+    for idx, total_pain, conflicts, fairness_gap in ranked:
+        slot_dt = start_dt + dt.timedelta(minutes=idx * slot_minutes)
+        slots.append({
+            'date': slot_dt.date(),
+            'hour': slot_dt.hour,
+            'minute': slot_dt.minute,
+            'time_str': pain_engine.slot_label(slot_minutes, idx),
+            'duration': duration_minutes,
+            'total_pain': total_pain,
+            'conflicts': conflicts,
+            'fairness_gap': fairness_gap,
+        })
+    return slots
+
+
+def best_slots(roster, conflicts, history_map, start_date, days=7, slot_minutes=60, duration_minutes=60, k=3):
+    """
+    Magic Algorithm: the k lowest-pain meeting windows weighted by historical karma.
+    Slots are ranked by: no conflicts > smallest lifetime fairness gap > lowest immediate pain.
+    history_map: {email: cumulative_pain_score}
+    """
+    top = top_k_slots(roster, conflicts, history_map, start_date, days, slot_minutes, duration_minutes, k)
+    return describe_slots(top, start_date, slot_minutes, duration_minutes)
+
+
+def trade_off_slots(roster, conflicts, history_map, start_date, days=7, slot_minutes=60, duration_minutes=60):
+    """Every slot on the conflicts / fairness gap / total pain front, ordered like best_slots."""
+    front = pareto_slots(roster, conflicts, history_map, start_date, days, slot_minutes, duration_minutes)
+    return describe_slots(front, start_date, slot_minutes, duration_minutes)
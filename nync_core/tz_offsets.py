@@ -0,0 +1,67 @@
+import datetime as dt
+import functools
+import numpy as np
+import pytz
+
+# Process-wide timezone offset tables. Every session in the Streamlit process
+# shares these caches, and teams tend to reuse a handful of zones, so after
+# warm-up nearly every lookup is a hit.
+
+EPOCH = dt.datetime(1970, 1, 1)
+_MINUTE = dt.timedelta(minutes=1)
+
+
+def to_epoch_minutes(naive_utc):
+    return (naive_utc - EPOCH) // _MINUTE
+
+
+@functools.lru_cache(maxsize=128)
+def _transitions(tz_str):
+    """(utc transition minutes, offset minutes) for tz_str, the same table pytz.fromutc bisects."""
+    tz = pytz.timezone(tz_str)
+    transitions = getattr(tz, '_utc_transition_times', None)
+    if not transitions:
+        offset = tz.utcoffset(EPOCH) or dt.timedelta(0)
+        trans_minutes = np.array([np.iinfo(np.int64).min], dtype=np.int64)
+        trans_offsets = np.array([offset // _MINUTE], dtype=np.int64)
+    else:
+        trans_minutes = np.array([to_epoch_minutes(t) for t in transitions], dtype=np.int64)
+        trans_offsets = np.array([info[0] // _MINUTE for info in tz._transition_info], dtype=np.int64)
+    trans_minutes.flags.writeable = False
+    trans_offsets.flags.writeable = False
+    return trans_minutes, trans_offsets
+
+
+def offsets_at(tz_str, utc_minutes):
+    """UTC offset (minutes) of tz_str at each UTC minute stamp. Raises on unknown zones."""
+    trans_minutes, trans_offsets = _transitions(tz_str)
+    idx = np.searchsorted(trans_minutes, utc_minutes, side='right') - 1
+    return trans_offsets[np.clip(idx, 0, len(trans_offsets) - 1)]
+
+
+@functools.lru_cache(maxsize=512)
+def slot_offsets(tz_str, start_date, days, slot_minutes=60):
+    """Read-only array of tz_str's UTC offset for every UTC slot in [start_date, start_date + days)."""
+    start = to_epoch_minutes(dt.datetime.combine(start_date, dt.time.min))
+    n_slots = days * (1440 // slot_minutes)
+    offsets = offsets_at(tz_str, start + slot_minutes * np.arange(n_slots, dtype=np.int64))
+    offsets.flags.writeable = False
+    return offsets
+
+
+def utc_offset(tz_str, utc_dt):
+    """Offset in minutes of tz_str at a single UTC datetime (naive or aware)."""
+    if utc_dt.tzinfo:
+        utc_dt = utc_dt.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return int(offsets_at(tz_str, to_epoch_minutes(utc_dt)))
+
+
+def to_local(utc_dt, tz_str):
+    """Naive local wall time of a UTC datetime, without a per-call pytz conversion."""
+    if utc_dt.tzinfo:
+        utc_dt = utc_dt.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return utc_dt + dt.timedelta(minutes=utc_offset(tz_str, utc_dt))
+
+
+def cache_info():
+    return {'zones': _transitions.cache_info(), 'ranges': slot_offsets.cache_info()}
@@ -0,0 +1,56 @@
+"""
+Sends provider-shaped push notifications to a local webhook server, so the
+invalidation path can be exercised without Google or Microsoft.
+
+    python scripts/simulate_webhook.py validate
+    python scripts/simulate_webhook.py google CHANNEL_ID CLIENT_STATE [--state exists|sync]
+    python scripts/simulate_webhook.py outlook SUBSCRIPTION_ID CLIENT_STATE [--change updated]
+
+CHANNEL_ID / SUBSCRIPTION_ID and CLIENT_STATE must match a calendar_channels row
+(id and client_state). Start the server with `python webhook_utils.py`.
+"""
+import argparse
+import sys
+import uuid
+import requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8600", help="webhook server base URL")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    sub.add_parser("validate", help="Graph subscription validation handshake")
+    google = sub.add_parser("google", help="events.watch notification")
+    google.add_argument("channel_id")
+    google.add_argument("client_state")
+    google.add_argument("--state", default="exists", choices=["sync", "exists", "not_exists"])
+    outlook = sub.add_parser("outlook", help="Graph change notification")
+    outlook.add_argument("subscription_id")
+    outlook.add_argument("client_state")
+    outlook.add_argument("--change", default="updated", choices=["created", "updated", "deleted"])
+    args = parser.parse_args(argv)
+
+    if args.kind == "validate":
+        token = uuid.uuid4().hex
+        r = requests.post(f"{args.url}/outlook", params={"validationToken": token}, timeout=5)
+        ok = r.status_code == 200 and r.text == token
+    elif args.kind == "google":
+        r = requests.post(f"{args.url}/google", timeout=5, headers={
+            "X-Goog-Channel-ID": args.channel_id, "X-Goog-Channel-Token": args.client_state,
+            "X-Goog-Resource-State": args.state, "X-Goog-Resource-ID": "simulated",
+            "X-Goog-Message-Number": "1",
+        })
+        ok = r.status_code == 200
+    else:
+        r = requests.post(f"{args.url}/outlook", timeout=5, json={"value": [{
+            "subscriptionId": args.subscription_id, "clientState": args.client_state,
+            "changeType": args.change, "resource": f"me/events/{uuid.uuid4().hex}",
+        }]})
+        ok = r.status_code == 202
+
+    print(f"{args.kind}: HTTP {r.status_code} {'ok' if ok else 'unexpected'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
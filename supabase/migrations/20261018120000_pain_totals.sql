@@ -0,0 +1,60 @@
+-- Per-(team, email) rollup of pain_ledger so the leaderboard and karma
+-- lookups read one row per member instead of summing the whole ledger.
+
+create table if not exists public.pain_totals (
+    team_id     uuid        not null references public.teams(id) on delete cascade,
+    user_email  text        not null,
+    total_pain  bigint      not null default 0,
+    updated_at  timestamptz not null default now(),
+    primary key (team_id, user_email)
+);
+
+alter table public.pain_totals enable row level security;
+
+create policy "Team members can read pain totals"
+    on public.pain_totals for select
+    using (exists (
+        select 1 from public.team_members tm
+        where tm.team_id = pain_totals.team_id and tm.user_id = auth.uid()
+    ));
+
+-- Kept in step by triggers on the ledger; runs as owner so RLS on
+-- pain_totals does not block the write.
+create or replace function public.apply_pain_ledger_change()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'INSERT' then
+        insert into pain_totals (team_id, user_email, total_pain)
+        select team_id, user_email, sum(pain_score) from new_rows group by team_id, user_email
+        on conflict (team_id, user_email)
+        do update set total_pain = pain_totals.total_pain + excluded.total_pain, updated_at = now();
+    elsif tg_op = 'DELETE' then
+        update pain_totals t
+        set total_pain = t.total_pain - d.pain, updated_at = now()
+        from (select team_id, user_email, sum(pain_score) as pain from old_rows group by team_id, user_email) d
+        where t.team_id = d.team_id and t.user_email = d.user_email;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists pain_ledger_totals_insert on public.pain_ledger;
+create trigger pain_ledger_totals_insert
+    after insert on public.pain_ledger
+    referencing new table as new_rows
+    for each statement execute function public.apply_pain_ledger_change();
+
+drop trigger if exists pain_ledger_totals_delete on public.pain_ledger;
+create trigger pain_ledger_totals_delete
+    after delete on public.pain_ledger
+    referencing old table as old_rows
+    for each statement execute function public.apply_pain_ledger_change();
+
+-- Backfill from the existing ledger
+insert into public.pain_totals (team_id, user_email, total_pain)
+select team_id, user_email, sum(pain_score) from public.pain_ledger group by team_id, user_email
+on conflict (team_id, user_email) do update set total_pain = excluded.total_pain, updated_at = now();
@@ -0,0 +1,52 @@
+-- Per-connection event store for incremental calendar sync. Each row holds
+-- the provider cursor (Google nextSyncToken or Graph calendarView deltaLink),
+-- the UTC window it was opened for, and the events seen so far as
+-- {event_id: [start_minute, end_minute, title]} in epoch minutes.
+
+create table if not exists public.calendar_sync_state (
+    user_id       uuid        not null references auth.users(id) on delete cascade,
+    provider      text        not null,
+    window_start  timestamptz not null,
+    window_end    timestamptz not null,
+    cursor        text,
+    events        jsonb       not null default '{}'::jsonb,
+    updated_at    timestamptz not null default now(),
+    primary key (user_id, provider)
+);
+
+alter table public.calendar_sync_state enable row level security;
+
+-- Whoever syncs a team's calendars reads and writes its members' state
+create policy "Teammates can manage calendar sync state"
+    on public.calendar_sync_state for all
+    using (user_id = auth.uid() or exists (
+        select 1 from public.team_members me
+        join public.team_members them on them.team_id = me.team_id
+        where me.user_id = auth.uid() and them.user_id = calendar_sync_state.user_id
+    ))
+    with check (user_id = auth.uid() or exists (
+        select 1 from public.team_members me
+        join public.team_members them on them.team_id = me.team_id
+        where me.user_id = auth.uid() and them.user_id = calendar_sync_state.user_id
+    ));
+
+-- Disconnecting a calendar drops its cached events and cursor
+create or replace function public.drop_calendar_sync_state()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    delete from calendar_sync_state s
+    using old_rows o
+    where s.user_id = o.user_id and s.provider = o.provider;
+    return null;
+end;
+$$;
+
+drop trigger if exists calendar_connections_drop_sync_state on public.calendar_connections;
+create trigger calendar_connections_drop_sync_state
+    after delete on public.calendar_connections
+    referencing old table as old_rows
+    for each statement execute function public.drop_calendar_sync_state();
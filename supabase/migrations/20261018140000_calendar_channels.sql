@@ -0,0 +1,35 @@
+-- Push channels per calendar connection: Google events.watch channels and
+-- Graph change-notification subscriptions. client_state is the secret the
+-- provider echoes back on every notification; the webhook server rejects
+-- notifications whose secret does not match.
+
+create table if not exists public.calendar_channels (
+    id            text        primary key,
+    user_id       uuid        not null references auth.users(id) on delete cascade,
+    provider      text        not null,
+    resource_id   text,
+    client_state  text        not null,
+    expires_at    timestamptz not null,
+    created_at    timestamptz not null default now(),
+    unique (user_id, provider)
+);
+
+create index if not exists calendar_channels_expires_at_idx on public.calendar_channels (expires_at);
+
+alter table public.calendar_channels enable row level security;
+revoke all on public.calendar_channels from anon;
+
+-- Only the cron worker and webhook server open, renew and verify channels.
+-- They connect with the service-role key ([supabase] service_key in secrets).
+create policy "Service role manages calendar channels"
+    on public.calendar_channels for all
+    to service_role
+    using (true)
+    with check (true);
+
+-- Members may see which of their own calendars have a live channel; nobody
+-- else can read another user's client_state
+create policy "Users can view their own calendar channels"
+    on public.calendar_channels for select
+    to authenticated
+    using (user_id = auth.uid());
@@ -0,0 +1,8 @@
+-- Meeting length and slot size a poll option was scored with, so booking
+-- creates an event of the proposed length and charges the same window pain
+-- the search ranked it on. Options proposed before this have nulls and book
+-- as 30-minute meetings, as they always did.
+
+alter table public.poll_options
+    add column if not exists duration_minutes integer check (duration_minutes > 0),
+    add column if not exists slot_minutes     integer check (slot_minutes in (15, 30, 60));
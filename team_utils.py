@@ -2,20 +2,32 @@ import streamlit as st
 import datetime as dt
 from db import supabase
 
+@st.cache_data(ttl=60)
+def get_pain_totals(team_id):
+    """Lifetime pain per email for a team, read from the pain_totals rollup (one row per member)"""
+    if not supabase: return {}
+    try:
+        resp = supabase.table("pain_totals").select("user_email, total_pain").eq("team_id", team_id).execute()
+        return {row['user_email']: row['total_pain'] for row in resp.data}
+    except: return {}
+
 @st.cache_data(ttl=60)
 def get_martyr_stats(team_id):
-    if not supabase: return []
+    leaderboard = [{"email": k, "total_pain": v} for k, v in get_pain_totals(team_id).items()]
+    leaderboard.sort(key=lambda x: x['total_pain'], reverse=True)
+    return leaderboard
+
+def record_pain(team_id, pain_inserts):
+    """Appends booking pain to the ledger; the pain_totals trigger keeps the rollup in step"""
+    if not supabase or not pain_inserts: return False
     try:
-        resp = supabase.table("pain_ledger").select("user_email, pain_score").eq("team_id", team_id).execute()
-        totals = {}
-        for row in resp.data:
-            e = row['user_email']
-            p = row['pain_score']
-            totals[e] = totals.get(e, 0) + p
-        leaderboard = [{"email": k, "total_pain": v} for k, v in totals.items()]
-        leaderboard.sort(key=lambda x: x['total_pain'], reverse=True)
-        return leaderboard
-    except: return []
+        supabase.table('pain_ledger').insert(pain_inserts).execute()
+        get_pain_totals.clear()
+        get_martyr_stats.clear()
+        return True
+    except Exception as e:
+        print(f"[nync] record_pain error: {e}")
+        return False
 
 @st.cache_data(ttl=60)
 def get_user_teams(user_id):
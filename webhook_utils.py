@@ -0,0 +1,177 @@
+import asyncio
+import datetime as dt
+import os
+import secrets
+import uuid
+import requests
+from aiohttp import web
+from db import service_supabase as supabase
+from async_calendar_utils import GOOGLE_API, GRAPH_API, provider_loop
+import cache_utils
+
+# Public HTTPS base the providers call back on (e.g. https://hooks.nync.app); push is off when unset
+WEBHOOK_URL = os.environ.get("NYNC_WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PORT = int(os.environ.get("NYNC_WEBHOOK_PORT", 8600))
+# Google channels last up to a week, Graph event subscriptions just under three days
+GOOGLE_CHANNEL_TTL = dt.timedelta(days=7)
+GRAPH_SUBSCRIPTION_TTL = dt.timedelta(minutes=4200)
+RENEW_BEFORE = dt.timedelta(hours=24)
+
+
+# --- CHANNEL MANAGEMENT (run from cron_worker) ---
+
+def push_enabled():
+    """Push needs a public URL and the service-role client; without it channels could be opened but never recorded."""
+    return bool(WEBHOOK_URL and supabase)
+
+def open_google_channel(token, channel_id, secret):
+    """Starts an events.watch channel; returns its resourceId and expiry, or None."""
+    body = {
+        "id": channel_id, "type": "web_hook", "address": f"{WEBHOOK_URL}/google", "token": secret,
+        "params": {"ttl": str(int(GOOGLE_CHANNEL_TTL.total_seconds()))},
+    }
+    r = requests.post(f"{GOOGLE_API}/calendars/primary/events/watch", json=body,
+                      headers={"Authorization": f"Bearer {token}"}, timeout=10)
+    if r.status_code != 200: return None
+    data = r.json()
+    expires_at = dt.datetime.utcfromtimestamp(int(data.get("expiration", 0)) / 1000) if data.get("expiration") \
+        else dt.datetime.utcnow() + GOOGLE_CHANNEL_TTL
+    return data.get("resourceId"), expires_at
+
+def stop_google_channel(token, channel):
+    try:
+        requests.post(f"{GOOGLE_API}/channels/stop", json={"id": channel["id"], "resourceId": channel.get("resource_id")},
+                      headers={"Authorization": f"Bearer {token}"}, timeout=10)
+    except Exception:
+        pass
+
+def open_graph_subscription(token, secret):
+    """Creates a Graph change-notification subscription on the user's events; returns (id, expiry) or None."""
+    expires_at = dt.datetime.utcnow() + GRAPH_SUBSCRIPTION_TTL
+    body = {
+        "changeType": "created,updated,deleted", "notificationUrl": f"{WEBHOOK_URL}/outlook",
+        "resource": "me/events", "expirationDateTime": expires_at.isoformat() + "Z", "clientState": secret,
+    }
+    r = requests.post(f"{GRAPH_API}/subscriptions", json=body, headers={"Authorization": f"Bearer {token}"}, timeout=10)
+    if r.status_code not in (200, 201): return None
+    return r.json().get("id"), expires_at
+
+def renew_graph_subscription(token, channel):
+    expires_at = dt.datetime.utcnow() + GRAPH_SUBSCRIPTION_TTL
+    r = requests.patch(f"{GRAPH_API}/subscriptions/{channel['id']}", json={"expirationDateTime": expires_at.isoformat() + "Z"},
+                       headers={"Authorization": f"Bearer {token}"}, timeout=10)
+    return expires_at if r.status_code == 200 else None
+
+def renew_channels():
+    """Opens push channels for connected calendars and replaces or extends those expiring within a day."""
+    if not WEBHOOK_URL: return
+    if not supabase:
+        print("[nync] NYNC_WEBHOOK_URL is set but [supabase] service_key is not; not opening push channels")
+        return
+    conns = supabase.table("calendar_connections").select("user_id, provider, access_token").execute().data or []
+    channels = {(c["user_id"], c["provider"]): c for c in (supabase.table("calendar_channels").select("*").execute().data or [])}
+    cutoff = dt.datetime.utcnow() + RENEW_BEFORE
+
+    for conn in conns:
+        uid, provider, token = conn["user_id"], conn["provider"], conn.get("access_token")
+        channel = channels.pop((uid, provider), None)
+        if not token: continue
+        if channel and dt.datetime.fromisoformat(channel["expires_at"]).replace(tzinfo=None) > cutoff: continue
+        try:
+            if provider == "outlook" and channel:
+                expires_at = renew_graph_subscription(token, channel)
+                if expires_at:
+                    supabase.table("calendar_channels").update({"expires_at": expires_at.isoformat()}).eq("id", channel["id"]).execute()
+                    continue
+
+            secret = secrets.token_urlsafe(24)
+            if provider == "google":
+                channel_id = str(uuid.uuid4())
+                opened = open_google_channel(token, channel_id, secret)
+                if not opened: continue
+                resource_id, expires_at = opened
+                if channel: stop_google_channel(token, channel)
+            elif provider == "outlook":
+                opened = open_graph_subscription(token, secret)
+                if not opened: continue
+                channel_id, expires_at = opened
+                resource_id = None
+            else:
+                continue
+
+            if channel:
+                supabase.table("calendar_channels").delete().eq("id", channel["id"]).execute()
+            supabase.table("calendar_channels").insert({
+                "id": channel_id, "user_id": uid, "provider": provider, "resource_id": resource_id,
+                "client_state": secret, "expires_at": expires_at.isoformat(),
+            }).execute()
+        except Exception as e:
+            print(f"[nync] Could not renew {provider} channel for user {uid}: {e}")
+
+    # Channels whose calendar was disconnected just lapse; forget them
+    for channel in channels.values():
+        supabase.table("calendar_channels").delete().eq("id", channel["id"]).execute()
+
+
+# --- NOTIFICATION INGESTION ---
+
+def invalidate_member(user_id):
+    """Drops one member's cached busy intervals in every team they belong to."""
+    cache = cache_utils.get_conflict_cache()
+    res = supabase.table("team_members").select("team_id").eq("user_id", user_id).execute()
+    for row in res.data or []:
+        cache.invalidate_member(row["team_id"], user_id)
+
+def _channel_owner(channel_id, provider, client_state):
+    """user_id for a known channel whose secret matches, else None."""
+    if not channel_id or not client_state: return None
+    res = supabase.table("calendar_channels").select("user_id, client_state").eq("id", channel_id).eq("provider", provider).maybe_single().execute()
+    if not res or not res.data or not secrets.compare_digest(res.data["client_state"], client_state): return None
+    return res.data["user_id"]
+
+async def handle_google(request):
+    # Google sends a "sync" ping when a channel opens, then "exists" on every change
+    state = request.headers.get("X-Goog-Resource-State")
+    uid = await asyncio.to_thread(_channel_owner, request.headers.get("X-Goog-Channel-ID"), "google",
+                                  request.headers.get("X-Goog-Channel-Token"))
+    if uid is None: return web.Response(status=404)
+    if state != "sync":
+        await asyncio.to_thread(invalidate_member, uid)
+    return web.Response(status=200)
+
+async def handle_outlook(request):
+    # Graph validates a new subscription by POSTing a token it expects echoed back as plain text
+    if "validationToken" in request.query:
+        return web.Response(text=request.query["validationToken"], content_type="text/plain")
+    try:
+        notifications = (await request.json()).get("value", [])
+    except Exception:
+        return web.Response(status=400)
+    owners = set()
+    for n in notifications:
+        uid = await asyncio.to_thread(_channel_owner, n.get("subscriptionId"), "outlook", n.get("clientState"))
+        if uid: owners.add(uid)
+    for uid in owners:
+        await asyncio.to_thread(invalidate_member, uid)
+    return web.Response(status=202)
+
+def make_app():
+    app = web.Application()
+    app.router.add_post("/google", handle_google)
+    app.router.add_post("/outlook", handle_outlook)
+    return app
+
+def start_webhook_server(port=WEBHOOK_PORT):
+    """Serves the webhook endpoints on the provider I/O loop so notifications reach this process's cache."""
+    async def serve():
+        runner = web.AppRunner(make_app())
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", port).start()
+        print(f"[nync] Webhook server listening on :{port}")
+    asyncio.run_coroutine_threadsafe(serve(), provider_loop())
+
+if __name__ == "__main__":
+    if not supabase:
+        raise SystemExit("[nync] The webhook server needs [supabase] service_key to read calendar_channels")
+    # Standalone mode; only shares invalidations with the app when NYNC_REDIS_URL points both at Redis
+    web.run_app(make_app(), port=WEBHOOK_PORT)